@@ -0,0 +1,224 @@
+import numpy as np
+import bitboard
+import heuristics
+from game_random import BatchRandom, TIE_BREAK_STREAM, game_seeds
+
+# Vectorized 2048 environment that steps a whole population of games with a handful of numpy ops
+# Boards are an (N, 4, 4) array of log2 exponents, 0 is an empty cell, same layout as bitboard.py
+# Other board sizes (3x3 to 8x8, see grid.py) are (N, size, size) arrays moved by the vectorized slide below,
+# the 4x4 board with the standard largest tile uses the bitboard row tables
+# Finished games stay in the arrays and are masked out by self.active instead of being removed
+# Network inputs are built from self.exponents by the encoders in encoders.py
+# Every game has its own random streams (see game_random.py), game i plays exactly like engine.Board with
+# GameRandom(env.seeds[i]) given the same moves, with record=True the moves are kept so env.trace(i) can save the game
+
+# numpy copies of the bitboard row tables, indexed by a 16 bit row with column 0 in the lowest nibble
+ROW_LEFT = np.array(bitboard.ROW_LEFT, dtype=np.int64)
+ROW_RIGHT = np.array(bitboard.ROW_RIGHT, dtype=np.int64)
+NIBBLE_SHIFTS = np.array([0, 4, 8, 12], dtype=np.int64)
+
+ROW_MOVABLE = np.array(bitboard.ROW_MOVABLE, dtype=np.uint8)
+DIRECTION_BITS = np.array(bitboard.DIRECTIONS, dtype=np.uint8)
+
+# numpy copy of the heuristics row tables, one table per row index
+ROW_TERMS = np.array(heuristics.ROW_TERMS, dtype=np.int64)
+ROW_INDICES = np.arange(4)
+
+
+# Pack the rows of an (N, 4, 4) exponent array into 16 bit ints
+def pack_rows(exponents):
+    return (exponents.astype(np.int64) << NIBBLE_SHIFTS).sum(axis=-1)
+
+
+# Packed 64 bit boards (see bitboard.py) of an (N, 4, 4) exponent array, as a uint64 array
+def pack_boards(exponents):
+    rows = pack_rows(exponents).astype(np.uint64)
+    return rows[..., 0] | (rows[..., 1] << 16) | (rows[..., 2] << 32) | (rows[..., 3] << 48)
+
+
+# bitboard.legal_mask of every board of an (N, 4, 4) exponent array, from row and column table lookups only
+def legal_masks(exponents):
+    rows = np.bitwise_or.reduce(ROW_MOVABLE[pack_rows(exponents)], axis=-1)
+    columns = np.bitwise_or.reduce(ROW_MOVABLE[pack_rows(exponents.transpose(0, 2, 1))], axis=-1)
+    return rows | (columns << 2)
+
+
+# Apply a row table to every row of an (N, 4, 4) exponent array, returns new exponents, merges and score per board
+def apply_row_table(exponents, table):
+    entries = table[pack_rows(exponents)]
+    moved = ((entries[..., None] >> NIBBLE_SHIFTS) & bitboard.CELL_MASK).astype(np.uint8)
+    merges = ((entries >> bitboard.MERGE_SHIFT) & bitboard.CELL_MASK).sum(axis=-1)
+    score = (entries >> bitboard.SCORE_SHIFT).sum(axis=-1)
+    return moved, merges, score
+
+
+# Move every board in the same direction, up and down work on the transposed boards
+def move_all(exponents, direction):
+    if direction == bitboard.LEFT:
+        return apply_row_table(exponents, ROW_LEFT)
+    if direction == bitboard.RIGHT:
+        return apply_row_table(exponents, ROW_RIGHT)
+    table = ROW_LEFT if direction == bitboard.UP else ROW_RIGHT
+    moved, merges, score = apply_row_table(exponents.transpose(0, 2, 1), table)
+    return moved.transpose(0, 2, 1), merges, score
+
+
+# Slide and merge the last axis of an exponent array towards index 0, any row length
+# Same rules as bitboard.slide_cells_left, tiles at max_exponent do not merge
+# Returns new exponents, merges and score per row
+def slide_left(rows, max_exponent):
+    # Stable sort puts the tiles first in their order and the empty cells after them
+    packed = np.take_along_axis(rows, np.argsort(rows == 0, axis=-1, kind="stable"), axis=-1)
+    merges = np.zeros(rows.shape[:-1], dtype=np.int64)
+    score = np.zeros(rows.shape[:-1], dtype=np.int64)
+    # Left to right, a merged pair leaves an empty cell so the next tile can not merge into it again
+    for col in range(rows.shape[-1] - 1):
+        left = packed[..., col]
+        merge = (left != 0) & (left == packed[..., col + 1]) & (left < max_exponent)
+        left += merge
+        packed[..., col + 1][merge] = 0
+        merges += merge
+        score += np.where(merge, np.left_shift(1, left.astype(np.int64)), 0)
+    moved = np.take_along_axis(packed, np.argsort(packed == 0, axis=-1, kind="stable"), axis=-1)
+    return moved, merges.sum(axis=-1), score.sum(axis=-1)
+
+
+# move_all for boards of any size and largest tile
+def slide_all(exponents, direction, max_exponent):
+    if direction in (bitboard.UP, bitboard.DOWN):
+        exponents = exponents.transpose(0, 2, 1)
+    if direction in (bitboard.RIGHT, bitboard.DOWN):
+        moved, merges, score = slide_left(exponents[..., ::-1], max_exponent)
+        moved = moved[..., ::-1]
+    else:
+        moved, merges, score = slide_left(exponents, max_exponent)
+    if direction in (bitboard.UP, bitboard.DOWN):
+        moved = moved.transpose(0, 2, 1)
+    return np.ascontiguousarray(moved), merges, score
+
+
+# legal_masks for boards of any size, a row can move left when a tile has an empty cell to its left
+# or an equal tile next to it, and right when a tile has an empty cell to its right or an equal tile next to it
+def slide_legal_masks(exponents, max_exponent):
+    masks = np.zeros(len(exponents), dtype=np.uint8)
+    for bit, boards in ((0, exponents), (2, exponents.transpose(0, 2, 1))):
+        left = boards[..., :-1]
+        right = boards[..., 1:]
+        merge = ((left != 0) & (left == right) & (left < max_exponent)).any(axis=(1, 2))
+        masks |= (merge | ((left == 0) & (right != 0)).any(axis=(1, 2))).astype(np.uint8) << bit
+        masks |= (merge | ((left != 0) & (right == 0)).any(axis=(1, 2))).astype(np.uint8) << (bit + 1)
+    return masks
+
+
+class BatchEnv:
+    # seed is anything np.random.SeedSequence takes, seeds gives every game its own 64 bit seed instead
+    # size and max_exponent pick the board size and the largest tile (two tiles of 2 ** max_exponent do not merge)
+    def __init__(self, n, seed=None, seeds=None, record=False, size=4, max_exponent=bitboard.MAX_EXPONENT):
+        self.n = n
+        self.size = size
+        self.cells = size * size
+        self.max_exponent = max_exponent
+        # The 4x4 row tables only know the standard largest tile
+        self.tables = size == 4 and max_exponent == bitboard.MAX_EXPONENT
+        self.seeds = game_seeds(seed, n) if seeds is None else np.asarray(seeds, dtype=np.uint64)
+        self.spawn_random = BatchRandom(self.seeds)
+        # Used by players to break ties between equally good moves
+        self.tie_break_random = BatchRandom(self.seeds, TIE_BREAK_STREAM)
+        # With record on, one int8 array of directions per step, -1 for games that did not move
+        self.history = [] if record else None
+        self.exponents = np.zeros((n, size, size), dtype=np.uint8)
+        self.active = np.ones(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.moves = np.zeros(n, dtype=np.int64)
+        # Every game starts with two random 2 or 4 tiles
+        everyone = np.arange(n)
+        self.spawn(everyone)
+        self.spawn(everyone)
+
+    # Put a 2 or 4 tile on a random empty cell of every board in indices
+    def spawn(self, indices):
+        if len(indices) == 0:
+            return
+        flat = self.exponents.reshape(self.n, self.cells)
+        # Same draws as engine.Board.do_move, the value first and then which of the empty cells
+        values = np.where(self.spawn_random.random(indices) < 0.5, 1, 2)
+        empty = flat[indices] == 0
+        picks = (self.spawn_random.random(indices) * empty.sum(axis=1)).astype(np.int64)
+        # The cell of the picks-th empty cell is the number of cells with at most picks empty cells up to them
+        cells = (empty.cumsum(axis=1) <= picks[:, None]).sum(axis=1)
+        flat[indices, cells] = values
+
+    # All four possible moves for every board, as (moved, merges, score) with a leading direction axis
+    def all_moves(self):
+        if self.tables:
+            results = [move_all(self.exponents, direction) for direction in bitboard.DIRECTIONS]
+        else:
+            results = [slide_all(self.exponents, direction, self.max_exponent) for direction in bitboard.DIRECTIONS]
+        moved = np.stack([result[0] for result in results])
+        merges = np.stack([result[1] for result in results])
+        score = np.stack([result[2] for result in results])
+        return moved, merges, score
+
+    # (N, 4) bool array, True where the move in that direction changes the board, no move is made to find out
+    def legal_moves(self):
+        return ((self.legal_masks()[:, None] >> DIRECTION_BITS) & 1).astype(bool)
+
+    # True for every board without a legal move
+    def terminal(self):
+        return self.legal_masks() == 0
+
+    # bitboard.legal_mask of every board
+    def legal_masks(self):
+        if self.tables:
+            return legal_masks(self.exponents)
+        return slide_legal_masks(self.exponents, self.max_exponent)
+
+    # Make one move per game, directions is an (N,) int array, games that are not active are left alone
+    # Boards that changed get a new tile, returns (changed, merges, score) per game
+    # Afterwards every game without a legal move is marked finished
+    def step(self, directions, moved_boards=None):
+        if moved_boards is None:
+            moved_boards = self.all_moves()
+        moved, merges, score = moved_boards
+        everyone = np.arange(self.n)
+        new_exponents = moved[directions, everyone]
+        changed = (new_exponents != self.exponents).any(axis=(1, 2)) & self.active
+        step_merges = np.where(changed, merges[directions, everyone], 0)
+        step_score = np.where(changed, score[directions, everyone], 0)
+        self.exponents[changed] = new_exponents[changed]
+        self.score += step_score
+        self.moves += changed
+        if self.history is not None:
+            self.history.append(np.where(changed, directions, -1).astype(np.int8))
+        self.spawn(np.flatnonzero(changed))
+        self.active &= ~self.terminal()
+        return changed, step_merges, step_score
+
+    # game_trace.Trace of game i, needs record=True
+    def trace(self, i):
+        from game_trace import Trace
+        if self.history is None:
+            raise RuntimeError("BatchEnv was created without record=True")
+        if self.size != 4:
+            raise RuntimeError("Traces only hold 4x4 boards")
+        moves = [int(step[i]) for step in self.history if step[i] >= 0]
+        return Trace(self.seeds[i], moves, pack_boards(self.exponents[i]), self.score[i])
+
+    # Tile values instead of exponents, of every game or only of game index
+    def values(self, index=None):
+        exponents = self.exponents if index is None else self.exponents[index]
+        return np.where(exponents > 0, np.left_shift(1, exponents.astype(np.int64)), 0)
+
+    def max_tiles(self):
+        return np.left_shift(1, self.exponents.max(axis=(1, 2)).astype(np.int64))
+
+    # heuristics.state_fitness for every board at once
+    def state_fitness(self, exponents=None):
+        if exponents is None:
+            exponents = self.exponents
+        if not self.tables:
+            return heuristics.state_fitness_batch(exponents)
+        summed = ROW_TERMS[ROW_INDICES, pack_rows(exponents)].sum(axis=1)
+        empty = (summed >> heuristics.EMPTY_SHIFT) & heuristics.FIELD_MASK
+        smoothness = (summed >> heuristics.SMOOTH_SHIFT) & heuristics.FIELD_MASK
+        return (summed >> heuristics.WEIGHTED_SHIFT) * (empty + 1) * smoothness
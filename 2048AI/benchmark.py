@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import neat
+import numpy as np
+import bitboard
+import grid
+import heuristics
+import textVersion2048
+from batch_env import BatchEnv
+from compiled_net import CompiledNetwork
+from encoders import ENCODERS, create_encoder, encoder_for_config
+from engine import Board
+from evaluation import SeededEvaluator
+
+# Speed benchmarks for the engine, heuristics, input encoding, network activation and whole generations
+# Every benchmark runs on a fixed seeded corpus so results can be compared between runs
+# Results are written as JSON, --compare prints the change against a saved baseline
+
+CONFIG_FILES = ["config-feedforward.txt", "config-feedforward-relu.txt", "config-feedforward-softplus.txt"]
+
+
+# Seeded corpus of packed boards reached by playing random moves from a new game
+def board_corpus(size, seed):
+    rng = random.Random(seed)
+    boards = []
+    board = 0
+    while len(boards) < size:
+        moves = [direction for direction in bitboard.DIRECTIONS if bitboard.move(board, direction)[0] != board]
+        if board == 0 or not moves:
+            board = 0
+            for position in rng.sample(range(16), 2):
+                board = bitboard.set_exponent(board, position, rng.choice([1, 2]))
+            continue
+        board = bitboard.move(board, rng.choice(moves))[0]
+        empty = bitboard.empty_positions(board)
+        board = bitboard.set_exponent(board, rng.choice(empty), rng.choice([1, 2]))
+        boards.append(board)
+    return boards
+
+
+# (N, 4, 4) exponent array of a corpus
+def corpus_exponents(boards):
+    return np.array([[[bitboard.get_exponent(board, 4 * row + col) for col in range(4)] for row in range(4)]
+                     for board in boards], dtype=np.uint8)
+
+
+# Call fn until min_time has passed, best of `repeats` runs, fn does `ops` operations per call
+def measure(fn, ops, min_time=0.2, repeats=3):
+    best = None
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        rate = calls * ops / elapsed
+        if best is None or rate > best:
+            best = rate
+    return {"ops_per_sec": best}
+
+
+def bench_engine_moves(boards, options):
+    board = Board()
+    directions = bitboard.DIRECTIONS
+
+    def run():
+        for state in boards:
+            for direction in directions:
+                board.state = state
+                board.move(direction)
+    return measure(run, 4 * len(boards), options.min_time)
+
+
+# Spawning a tile on every corpus board that has room for one
+def bench_engine_spawns(boards, options):
+    board = Board()
+    states = [state for state in boards if bitboard.empty_mask(state)]
+
+    def run():
+        for state in states:
+            board.state = state
+            board.do_move()
+    return measure(run, len(states), options.min_time)
+
+
+def bench_bitboard_moves(boards, options):
+    def run():
+        for state in boards:
+            bitboard.move_left(state)
+            bitboard.move_right(state)
+            bitboard.move_up(state)
+            bitboard.move_down(state)
+    return measure(run, 4 * len(boards), options.min_time)
+
+
+def bench_text_moves(boards, options):
+    grids = [bitboard.to_values(board) for board in boards]
+    moves = [textVersion2048.move_left, textVersion2048.move_right, textVersion2048.move_up, textVersion2048.move_down]
+
+    def run():
+        for grid in grids:
+            for move in moves:
+                # move_left changes the rows in place
+                move([row[:] for row in grid])
+    return measure(run, 4 * len(grids), options.min_time)
+
+
+def bench_batch_moves(boards, options):
+    env = BatchEnv(len(boards))
+    env.exponents = corpus_exponents(boards)
+    return measure(env.all_moves, 4 * len(boards), options.min_time)
+
+
+def bench_heuristics(boards, options):
+    def run():
+        for board in boards:
+            heuristics.state_fitness(board)
+    return measure(run, len(boards), options.min_time)
+
+
+def bench_batch_heuristics(boards, options):
+    env = BatchEnv(len(boards))
+    env.exponents = corpus_exponents(boards)
+    return measure(env.state_fitness, len(boards), options.min_time)
+
+
+def bench_encoding(boards, options):
+    exponents = corpus_exponents(boards)
+    results = {}
+    for name in sorted(ENCODERS):
+        encoder = create_encoder(name)
+        results[name] = measure(lambda: encoder.encode(exponents), len(boards), options.min_time)
+    return results
+
+
+# Activation of a freshly created genome of every config, neat's network one board at a time and the compiled one batched
+def bench_activation(boards, options):
+    exponents = corpus_exponents(boards)
+    results = {}
+    for config_file in CONFIG_FILES:
+        config = load_config(config_file)
+        genome = config.genome_type(0)
+        genome.configure_new(config.genome_config)
+        inputs = encoder_for_config(config).encode(exponents).copy()
+        neat_net = neat.nn.FeedForwardNetwork.create(genome, config)
+        compiled_net = CompiledNetwork.create(genome, config)
+
+        def run_neat():
+            for row in inputs:
+                neat_net.activate(row)
+        results[config_file] = {"neat": measure(run_neat, len(inputs), options.min_time),
+                                "compiled": measure(lambda: compiled_net.activate_batch(inputs), len(inputs), options.min_time)}
+    return results
+
+
+# Whole generations with seeded evaluation, reports generations and moves per second for every config
+def bench_generation(boards, options):
+    results = {}
+    for config_file in CONFIG_FILES:
+        config = load_config(config_file)
+        # Keep the run going no matter how good the genomes get
+        config.fitness_threshold = float("inf")
+        random.seed(options.seed)
+        population = neat.Population(config)
+        evaluator = SeededEvaluator(options.seed, encoder=encoder_for_config(config))
+        moves = [0]
+
+        def evaluate(genomes, config):
+            evaluator.evaluate(genomes, config)
+            moves[0] += sum(genome.moves_played for _, genome in genomes)
+        start = time.perf_counter()
+        population.run(evaluate, options.generations)
+        elapsed = time.perf_counter() - start
+        results[config_file] = {"generations_per_sec": options.generations / elapsed,
+                                "moves_per_sec": moves[0] / elapsed}
+    return results
+
+
+# Random play on every board size, len(boards) games stepped together for at least min_time, moves per second
+# Larger boards take far longer to fill up, so the games are not played to the end
+def bench_board_sizes(boards, options):
+    results = {}
+    for size in range(grid.MIN_SIZE, grid.MAX_SIZE + 1):
+        env = BatchEnv(len(boards), options.seed, size=size)
+        moves = 0
+        start = time.perf_counter()
+        while env.active.any() and time.perf_counter() - start < options.min_time:
+            directions = np.where(env.legal_moves(), env.tie_break_random.random_columns(4), -1.0).argmax(axis=1)
+            moves += int(env.active.sum())
+            env.step(directions)
+        results[str(size)] = moves / (time.perf_counter() - start)
+    return results
+
+
+BENCHMARKS = {
+    "engine_moves": bench_engine_moves,
+    "engine_spawns": bench_engine_spawns,
+    "bitboard_moves": bench_bitboard_moves,
+    "text_moves": bench_text_moves,
+    "batch_moves": bench_batch_moves,
+    "heuristics": bench_heuristics,
+    "batch_heuristics": bench_batch_heuristics,
+    "encoding": bench_encoding,
+    "activation": bench_activation,
+    "generation": bench_generation,
+    "board_sizes": bench_board_sizes,
+}
+
+
+def load_config(config_file):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), config_file)
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation, path)
+
+
+def run_benchmarks(names, options):
+    boards = board_corpus(options.corpus_size, options.seed)
+    results = {}
+    for name in names:
+        print("Running", name, file=sys.stderr)
+        results[name] = BENCHMARKS[name](boards, options)
+    return {"meta": {"python": platform.python_version(),
+                     "numpy": np.__version__,
+                     "machine": platform.machine(),
+                     "seed": options.seed,
+                     "corpus_size": options.corpus_size},
+            "results": results}
+
+
+# Flatten nested results into {"bench/sub/metric": value}
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = prefix + "/" + key if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+# Print the change of every metric against a baseline, returns the metrics slower than the tolerance allows
+def compare(report, baseline, tolerance):
+    current = flatten(report["results"])
+    previous = flatten(baseline["results"])
+    regressions = []
+    for name in sorted(current):
+        if name not in previous:
+            print("{0:60s} {1:14.1f}  (new)".format(name, current[name]))
+            continue
+        ratio = current[name] / previous[name] if previous[name] else float("inf")
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("{0:60s} {1:14.1f} {2:14.1f} {3:7.2f}x{4}".format(name, previous[name], current[name], ratio, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the 2048 engine and training loop")
+    parser.add_argument("benchmarks", nargs="*", help="Benchmarks to run, all of them by default: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the board corpus and the games")
+    parser.add_argument("--corpus-size", type=int, default=1000, help="Number of boards in the corpus")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds every measurement runs for at least")
+    parser.add_argument("--generations", type=int, default=1, help="Generations per config in the generation benchmark")
+    parser.add_argument("--output", default=None, help="Write the JSON results here instead of stdout")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Slowdown allowed before a metric counts as a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: " + ", ".join(unknown))
+
+    report = run_benchmarks(args.benchmarks or list(BENCHMARKS), args)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
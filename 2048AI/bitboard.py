@@ -0,0 +1,245 @@
+from table_cache import load_tables
+
+# Compact 2048 board encoding, the whole 4x4 board packed into one 64 bit integer
+# Every cell is a nibble holding the log2 exponent of its tile, 0 is an empty cell, 1 is a 2 tile, 11 is 2048
+# Cell (row, col) lives at nibble 4 * row + col, so each row is one 16 bit chunk with column 0 in the lowest nibble
+# Boards are plain ints so they are hashable and can be used directly as dictionary keys
+# The row tables are cached on disk after the first import, see table_cache.py
+
+LEFT = 0
+RIGHT = 1
+UP = 2
+DOWN = 3
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+
+ROW_MASK = 0xFFFF
+CELL_MASK = 0xF
+MAX_EXPONENT = 15
+
+# Row table entries pack the moved row, the merge count and the score delta into one int
+# bits 0-15 new row, bits 16-19 merges, bits 20+ score (sum of the values of the merged tiles)
+MERGE_SHIFT = 16
+SCORE_SHIFT = 20
+
+
+def row_to_cells(row):
+    return [(row >> (4 * col)) & CELL_MASK for col in range(4)]
+
+
+def cells_to_row(cells):
+    row = 0
+    for col, exponent in enumerate(cells):
+        row |= exponent << (4 * col)
+    return row
+
+
+# Slide and merge a list of 4 exponents towards index 0, same rules as Board.move_left
+# Two 32768 tiles can not merge because the result would not fit in a nibble
+def slide_cells_left(cells):
+    tiles = [exponent for exponent in cells if exponent != 0]
+    moved = []
+    merges = 0
+    score = 0
+    i = 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] < MAX_EXPONENT:
+            moved.append(tiles[i] + 1)
+            merges += 1
+            score += 1 << (tiles[i] + 1)
+            i += 2
+        else:
+            moved.append(tiles[i])
+            i += 1
+    moved += [0] * (4 - len(moved))
+    return moved, merges, score
+
+
+# Build the 65536 entry row transition tables for moving a single row left and right
+def build_row_tables():
+    left_table = [0] * 65536
+    right_table = [0] * 65536
+    for row in range(65536):
+        cells = row_to_cells(row)
+        moved, merges, score = slide_cells_left(cells)
+        left_table[row] = cells_to_row(moved) | (merges << MERGE_SHIFT) | (score << SCORE_SHIFT)
+        moved, merges, score = slide_cells_left(cells[::-1])
+        right_table[row] = cells_to_row(moved[::-1]) | (merges << MERGE_SHIFT) | (score << SCORE_SHIFT)
+    return left_table, right_table
+
+
+ROW_LEFT, ROW_RIGHT = load_tables("bitboard-rows", build_row_tables, [__file__])
+
+
+# Convert between a 4x4 list of tile values (0, 2, 4, ...) and a packed board
+def from_values(values):
+    board = 0
+    for row in range(4):
+        for col in range(4):
+            value = values[row][col]
+            if value:
+                board |= (value.bit_length() - 1) << (4 * (4 * row + col))
+    return board
+
+
+def to_values(board):
+    values = []
+    for row in range(4):
+        row_bits = (board >> (16 * row)) & ROW_MASK
+        values.append([1 << exponent if exponent else 0 for exponent in row_to_cells(row_bits)])
+    return values
+
+
+def get_exponent(board, position):
+    return (board >> (4 * position)) & CELL_MASK
+
+
+def set_exponent(board, position, exponent):
+    shift = 4 * position
+    return (board & ~(CELL_MASK << shift)) | (exponent << shift)
+
+
+def max_exponent(board):
+    best = 0
+    while board:
+        exponent = board & CELL_MASK
+        if exponent > best:
+            best = exponent
+        board >>= 4
+    return best
+
+
+# Swap rows and columns, cell (row, col) moves to (col, row)
+def transpose(board):
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+# Mirror every row left to right
+def reverse_rows(board):
+    board = ((board & 0x0F0F0F0F0F0F0F0F) << 4) | ((board >> 4) & 0x0F0F0F0F0F0F0F0F)
+    return ((board & 0x00FF00FF00FF00FF) << 8) | ((board >> 8) & 0x00FF00FF00FF00FF)
+
+
+# Mirror the board top to bottom
+def reverse_columns(board):
+    board = ((board & 0x0000FFFF0000FFFF) << 16) | ((board >> 16) & 0x0000FFFF0000FFFF)
+    return ((board & 0x00000000FFFFFFFF) << 32) | (board >> 32)
+
+
+# The 8 boards the board turns into by rotating and mirroring it, the board itself first
+def symmetries(board):
+    mirrored = reverse_rows(board)
+    boards = (board, mirrored, reverse_columns(board), reverse_columns(mirrored))
+    return boards + tuple(transpose(flipped) for flipped in boards)
+
+
+# Smallest of the 8 symmetries, the same for every rotation and mirror image of a board
+def canonical(board):
+    return min(symmetries(board))
+
+
+# Apply a row table to all 4 rows, returns the new board, merge count and score delta
+def apply_row_table(board, table):
+    moved = 0
+    merges = 0
+    score = 0
+    for shift in (0, 16, 32, 48):
+        entry = table[(board >> shift) & ROW_MASK]
+        moved |= (entry & ROW_MASK) << shift
+        merges += (entry >> MERGE_SHIFT) & CELL_MASK
+        score += entry >> SCORE_SHIFT
+    return moved, merges, score
+
+
+def move_left(board):
+    return apply_row_table(board, ROW_LEFT)
+
+
+def move_right(board):
+    return apply_row_table(board, ROW_RIGHT)
+
+
+# Moving up is moving left on the transposed board
+def move_up(board):
+    moved, merges, score = apply_row_table(transpose(board), ROW_LEFT)
+    return transpose(moved), merges, score
+
+
+def move_down(board):
+    moved, merges, score = apply_row_table(transpose(board), ROW_RIGHT)
+    return transpose(moved), merges, score
+
+
+MOVES = (move_left, move_right, move_up, move_down)
+
+# Bit 0 of ROW_MOVABLE[row] is set when the row can move left, bit 1 when it can move right
+def build_movable_table():
+    return [int(ROW_LEFT[row] & ROW_MASK != row) | (int(ROW_RIGHT[row] & ROW_MASK != row) << 1) for row in range(65536)]
+
+
+ROW_MOVABLE = load_tables("bitboard-movable", build_movable_table, [__file__])
+
+
+# 4 bit mask of the moves that change the board, bit d is set when direction d is legal, 0 means the game is over
+# Only looks the rows and columns up in ROW_MOVABLE, no move is made
+def legal_mask(board):
+    mask = (ROW_MOVABLE[board & ROW_MASK] | ROW_MOVABLE[(board >> 16) & ROW_MASK]
+            | ROW_MOVABLE[(board >> 32) & ROW_MASK] | ROW_MOVABLE[(board >> 48) & ROW_MASK])
+    # Moving up and down is moving left and right on the transposed board
+    columns = transpose(board)
+    mask |= (ROW_MOVABLE[columns & ROW_MASK] | ROW_MOVABLE[(columns >> 16) & ROW_MASK]
+             | ROW_MOVABLE[(columns >> 32) & ROW_MASK] | ROW_MOVABLE[(columns >> 48) & ROW_MASK]) << 2
+    return mask
+
+
+def is_terminal(board):
+    return legal_mask(board) == 0
+
+
+# Make a move in one of the DIRECTIONS, the board did not change if the returned board equals the input
+def move(board, direction):
+    return MOVES[direction](board)
+
+
+# Bit col of ROW_EMPTY[row] is set when column col of the 16 bit row is empty
+def build_empty_table():
+    return [sum(1 << col for col in range(4) if (row >> (4 * col)) & CELL_MASK == 0) for row in range(65536)]
+
+
+ROW_EMPTY = load_tables("bitboard-empty", build_empty_table, [__file__])
+# Set bits of every byte, in increasing order, to find the n-th empty cell of a 16 bit empty mask
+BYTE_POSITIONS = [tuple(bit for bit in range(8) if (byte >> bit) & 1) for byte in range(256)]
+
+
+# 16 bit mask with bit position set for every empty cell, four table lookups instead of scanning 16 cells
+def empty_mask(board):
+    return (ROW_EMPTY[board & ROW_MASK] | (ROW_EMPTY[(board >> 16) & ROW_MASK] << 4)
+            | (ROW_EMPTY[(board >> 32) & ROW_MASK] << 8) | (ROW_EMPTY[(board >> 48) & ROW_MASK] << 12))
+
+
+def count_empty(mask):
+    return len(BYTE_POSITIONS[mask & 0xFF]) + len(BYTE_POSITIONS[mask >> 8])
+
+
+# Position of the n-th (from 0) empty cell of an empty mask, cells counted left to right and top to bottom
+def nth_empty_position(mask, n):
+    low = BYTE_POSITIONS[mask & 0xFF]
+    if n < len(low):
+        return low[n]
+    return BYTE_POSITIONS[mask >> 8][n - len(low)] + 8
+
+
+def empty_positions(board):
+    mask = empty_mask(board)
+    return list(BYTE_POSITIONS[mask & 0xFF]) + [position + 8 for position in BYTE_POSITIONS[mask >> 8]]
+
+
+def print_board(board):
+    for row in to_values(board):
+        print(" ".join(str(value) for value in row))
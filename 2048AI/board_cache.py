@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import bitboard
+
+# Bounded least recently used cache of values per packed board (see bitboard.py), with hit statistics
+# A symmetric cache keys boards by bitboard.canonical, so all 8 rotations and mirror images of a board share one entry
+# That is only right for values every symmetry of a board shares, like heuristics.symmetric_state_fitness
+# or a search using it, heuristics.state_fitness favours the top left corner and needs a cache that is not symmetric
+
+
+class BoardCache:
+    # max_size bounds the number of entries, the least recently used one is dropped to make room
+    def __init__(self, max_size=1 << 20, symmetric=False):
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1, got {0}".format(max_size))
+        self.max_size = max_size
+        self.symmetric = symmetric
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # depth tells apart values of the same board, like search values at different depths
+    def key(self, board, depth=None):
+        if self.symmetric:
+            board = bitboard.canonical(board)
+        return board if depth is None else (board, depth)
+
+    # The cached value, None when the board is not cached
+    def get(self, board, depth=None):
+        key = self.key(board, depth)
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, board, value, depth=None):
+        key = self.key(board, depth)
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate()}
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Wraps an evaluator, like heuristics.state_fitness, so every board is only evaluated once while it stays cached
+class CachedEvaluator:
+    def __init__(self, evaluate, max_size=1 << 20, symmetric=False):
+        self.evaluate = evaluate
+        self.cache = BoardCache(max_size, symmetric)
+
+    def __call__(self, board):
+        value = self.cache.get(board)
+        if value is None:
+            value = self.evaluate(board)
+            self.cache.put(board, value)
+        return value
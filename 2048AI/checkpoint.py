@@ -0,0 +1,146 @@
+import gzip
+import logging
+import os
+import pickle
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import neat
+
+# Population checkpoints and saved genomes for long training runs
+# Checkpoints use the same (generation, config, population, species_set, random state) tuple as neat.Checkpointer,
+# so neat.Checkpointer.restore_checkpoint can read them too
+# Objects are pickled on the training thread, compressing and writing happens on a background thread
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_LEVEL = 3
+
+
+# Writes gzip files from a single background thread in submission order
+# Files are written to a temporary name first so a preempted write never leaves a broken file behind
+class AsyncWriter:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+
+    def write(self, path, data):
+        self.pending = [future for future in self.pending if not future.done()]
+        self.pending.append(self.executor.submit(self._write, path, data))
+
+    def _write(self, path, data):
+        # zlib releases the GIL while compressing so this does not hold up training
+        compressed = gzip.compress(data, COMPRESS_LEVEL)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(compressed)
+        os.replace(temporary, path)
+        logger.debug("Wrote %s", path)
+
+    # Wait for every write submitted so far
+    def flush(self):
+        for future in self.pending:
+            future.result()
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown()
+
+
+def dump(obj):
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(path):
+    with gzip.open(path) as f:
+        return pickle.load(f)
+
+
+# Saved genomes (best-<generation>.gz and winner.gz) hold the genome together with the config it was trained with,
+# so they can be played without the config file, returns (genome, config)
+def load_genome(path):
+    return load(path)
+
+
+def checkpoint_path(directory, generation):
+    return os.path.join(directory, "checkpoint-{0}.gz".format(generation))
+
+
+# Newest checkpoint in a directory, or None when there is none
+def latest_checkpoint(directory):
+    if not os.path.isdir(directory):
+        return None
+    generations = []
+    for name in os.listdir(directory):
+        if name.startswith("checkpoint-") and name.endswith(".gz"):
+            generations.append(int(name[len("checkpoint-"):-len(".gz")]))
+    if not generations:
+        return None
+    return checkpoint_path(directory, max(generations))
+
+
+# Resume a population from a checkpoint, the statistics saved next to it are restored into stats when given
+def restore_checkpoint(path, stats=None):
+    generation, config, population, species_set, random_state = load(path)
+    random.setstate(random_state)
+    stats_path = os.path.join(os.path.dirname(path), "stats.gz")
+    if stats is not None and os.path.exists(stats_path):
+        stats.most_fit_genomes, stats.generation_statistics = load(stats_path)
+    population = neat.Population(config, (population, species_set, generation))
+    # The species set still points at the reporters of the run that saved it
+    population.species.reporters = population.reporters
+    return population
+
+
+# Saves the population every generation_interval generations (or time_interval_seconds, whichever comes first),
+# the best genome of every generation, and the StatisticsReporter data, all into one directory
+class AsyncCheckpointer(neat.reporting.BaseReporter):
+    def __init__(self, directory, generation_interval=5, time_interval_seconds=600, stats=None):
+        self.directory = directory
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.stats = stats
+        self.writer = AsyncWriter()
+        self.current_generation = None
+        self.last_generation_checkpoint = None
+        self.last_time_checkpoint = time.time()
+        os.makedirs(directory, exist_ok=True)
+
+    # neat pickles the reporters along with the species set, the writer thread is left out
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["writer"] = None
+        return state
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+        if self.last_generation_checkpoint is None:
+            self.last_generation_checkpoint = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        path = os.path.join(self.directory, "best-{0}.gz".format(self.current_generation))
+        self.writer.write(path, dump((best_genome, config)))
+
+    def end_generation(self, config, population, species_set):
+        # population is already the next generation here, so the checkpoint is labelled with the next generation number
+        next_generation = self.current_generation + 1
+        due = next_generation - self.last_generation_checkpoint >= self.generation_interval
+        if self.time_interval_seconds is not None and time.time() - self.last_time_checkpoint >= self.time_interval_seconds:
+            due = True
+        if not due:
+            return
+        logger.info("Saving checkpoint for generation %d", next_generation)
+        data = (next_generation, config, population, species_set, random.getstate())
+        self.writer.write(checkpoint_path(self.directory, next_generation), dump(data))
+        if self.stats is not None:
+            self.writer.write(os.path.join(self.directory, "stats.gz"),
+                              dump((self.stats.most_fit_genomes, self.stats.generation_statistics)))
+        self.last_generation_checkpoint = next_generation
+        self.last_time_checkpoint = time.time()
+
+    # Save the winner and wait for every pending write, call once training has finished
+    def close(self, winner=None, config=None):
+        if winner is not None:
+            self.writer.write(os.path.join(self.directory, "winner.gz"), dump((winner, config)))
+        self.writer.close()
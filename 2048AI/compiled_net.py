@@ -0,0 +1,172 @@
+import numpy as np
+import neat
+from neat.graphs import feed_forward_layers
+
+# Evolved feed forward genomes compiled into dense numpy weight matrices
+# Gives the same outputs as neat.nn.FeedForwardNetwork.activate but evaluates a whole layer, and many boards, per matrix product
+
+
+# numpy versions of the neat activation functions, same clamping as neat/activations.py
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def _tanh(z):
+    return np.tanh(np.clip(2.5 * z, -60.0, 60.0))
+
+
+def _sin(z):
+    return np.sin(np.clip(5.0 * z, -60.0, 60.0))
+
+
+def _gauss(z):
+    return np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2)
+
+
+def _relu(z):
+    return np.where(z > 0.0, z, 0.0)
+
+
+def _softplus(z):
+    return 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0)))
+
+
+def _inv(z):
+    with np.errstate(divide="ignore"):
+        inverted = 1.0 / z
+    return np.where(z == 0.0, 0.0, inverted)
+
+
+ACTIVATIONS = {
+    "sigmoid": _sigmoid,
+    "tanh": _tanh,
+    "sin": _sin,
+    "gauss": _gauss,
+    "relu": _relu,
+    "softplus": _softplus,
+    "identity": lambda z: z,
+    "clamped": lambda z: np.clip(z, -1.0, 1.0),
+    "inv": _inv,
+    "log": lambda z: np.log(np.maximum(z, 1e-7)),
+    "exp": lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    "abs": np.abs,
+    "hat": lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    "square": lambda z: z ** 2,
+    "cube": lambda z: z ** 3,
+}
+
+# Aggregations that can be written as a weighted sum
+AGGREGATIONS = ("sum", "mean")
+
+
+class UnsupportedGenome(ValueError):
+    pass
+
+
+class CompiledNetwork:
+    # Every node has a slot in a value array, inputs first, then outputs, then hidden nodes
+    # A step is (source slots, weights, target slots, biases, responses, activation) for a group of nodes
+    # in the same layer with the same activation function
+    def __init__(self, num_inputs, num_slots, output_slots, steps):
+        self.num_inputs = num_inputs
+        self.num_slots = num_slots
+        self.output_slots = output_slots
+        self.steps = steps
+
+    @staticmethod
+    def create(genome, config):
+        genome_config = config.genome_config
+        input_keys = genome_config.input_keys
+        output_keys = genome_config.output_keys
+
+        # Gather expressed connections.
+        connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+        layers = feed_forward_layers(input_keys, output_keys, connections)
+
+        slots = {}
+        for key in list(input_keys) + list(output_keys):
+            slots[key] = len(slots)
+        for layer in layers:
+            for node in sorted(layer):
+                if node not in slots:
+                    slots[node] = len(slots)
+
+        incoming = {}
+        for inode, onode in connections:
+            incoming.setdefault(onode, []).append((inode, genome.connections[(inode, onode)].weight))
+
+        steps = []
+        for layer in layers:
+            groups = {}
+            for node in sorted(layer):
+                node_gene = genome.nodes[node]
+                if node_gene.activation not in ACTIVATIONS or node_gene.aggregation not in AGGREGATIONS:
+                    raise UnsupportedGenome("Node {0} uses {1} activation with {2} aggregation".format(
+                        node, node_gene.activation, node_gene.aggregation))
+                groups.setdefault(node_gene.activation, []).append(node)
+
+            for activation, nodes in groups.items():
+                sources = sorted(set(slots[inode] for node in nodes for inode, _ in incoming.get(node, [])))
+                source_index = {slot: i for i, slot in enumerate(sources)}
+                weights = np.zeros((len(sources), len(nodes)))
+                for column, node in enumerate(nodes):
+                    links = incoming.get(node, [])
+                    # mean aggregation is a sum with every weight divided by the number of links
+                    scale = 1.0 / len(links) if genome.nodes[node].aggregation == "mean" and links else 1.0
+                    for inode, weight in links:
+                        weights[source_index[slots[inode]], column] += weight * scale
+                biases = np.array([genome.nodes[node].bias for node in nodes])
+                responses = np.array([genome.nodes[node].response for node in nodes])
+                targets = np.array([slots[node] for node in nodes])
+                steps.append((np.array(sources, dtype=np.int64), weights, targets, biases, responses, ACTIVATIONS[activation]))
+
+        output_slots = np.array([slots[key] for key in output_keys])
+        return CompiledNetwork(len(input_keys), len(slots), output_slots, steps)
+
+    # Outputs for a batch of inputs, (B, num_inputs) in and (B, num_outputs) out
+    def activate_batch(self, inputs):
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if inputs.shape[1] != self.num_inputs:
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(self.num_inputs, inputs.shape[1]))
+        values = np.zeros((len(inputs), self.num_slots))
+        values[:, :self.num_inputs] = inputs
+        for sources, weights, targets, biases, responses, activation in self.steps:
+            values[:, targets] = activation(biases + responses * (values[:, sources] @ weights))
+        return values[:, self.output_slots]
+
+    # Same interface as neat.nn.FeedForwardNetwork.activate, one input vector in and a list of outputs out
+    def activate(self, inputs):
+        return self.activate_batch(np.asarray(inputs, dtype=np.float64)[None])[0].tolist()
+
+
+# Network backends, "numpy" falls back to neat for genomes it can not compile (like max aggregation)
+BACKENDS = ("numpy", "neat")
+
+
+def create_network(genome, config, backend="numpy"):
+    if backend == "numpy":
+        try:
+            return CompiledNetwork.create(genome, config)
+        except UnsupportedGenome:
+            pass
+    return neat.nn.FeedForwardNetwork.create(genome, config)
+
+
+# Outputs of any network for a batch of inputs
+def activate_batch(net, inputs):
+    if isinstance(net, CompiledNetwork):
+        return net.activate_batch(inputs)
+    return np.array([net.activate(row) for row in inputs])
+
+
+# Activate many networks on many boards at once, game i is played by nets[i] with inputs[i]
+# Games sharing a network are activated together in one batch, games that are not active get all zero outputs
+def activate_population(nets, inputs, active=None, num_outputs=4):
+    outputs = np.zeros((len(nets), num_outputs))
+    groups = {}
+    for index, net in enumerate(nets):
+        if active is None or active[index]:
+            groups.setdefault(id(net), (net, []))[1].append(index)
+    for net, indices in groups.values():
+        outputs[indices] = activate_batch(net, inputs[indices])
+    return outputs
@@ -0,0 +1,84 @@
+import numpy as np
+import bitboard
+
+# Network input encoders, each turns an (N, 4, 4) array of log2 exponents (see batch_env.py) into an (N, size) input array
+# Other board sizes work the same way with cells set to the number of cells on the board
+# The returned array is a buffer owned by the encoder and overwritten by the next call, so use it before encoding again
+# encoder_for_config picks the encoder matching num_inputs, configure_inputs does the reverse and sets num_inputs
+
+
+# Per cell a one-hot of the exponent, optionally followed by a one-hot of the cell position
+# With 11 value slots and positions this is the original 432 input encoding of config-feedforward.txt
+# Exponents that do not fit in the value slots are left out
+class OneHotEncoder:
+    def __init__(self, value_slots=11, positions=True, cells=16):
+        self.value_slots = value_slots
+        self.positions = positions
+        self.cells = cells
+        self.cell_size = value_slots + (cells if positions else 0)
+        self.size = cells * self.cell_size
+        self.buffer = np.zeros((0, cells, self.cell_size))
+
+    def encode(self, exponents):
+        n = len(exponents)
+        if len(self.buffer) != n:
+            self.buffer = np.zeros((n, self.cells, self.cell_size))
+            # The position part never changes so it is only written when the buffer is created
+            if self.positions:
+                self.buffer[:, :, self.value_slots:] = np.eye(self.cells)
+        self.buffer[:, :, :self.value_slots] = 0
+        flat = exponents.reshape(n, self.cells)
+        game_index, cell_index = np.nonzero((flat > 0) & (flat < self.value_slots))
+        self.buffer[game_index, cell_index, flat[game_index, cell_index]] = 1.0
+        return self.buffer.reshape(n, self.size)
+
+
+# Compact encoding with k inputs per cell
+# k=1 gives the exponent scaled to 0-1 by max_exponent, k>1 gives the k lowest binary digits of the exponent
+class ExponentEncoder:
+    def __init__(self, k=1, max_exponent=17, cells=16):
+        self.k = k
+        self.max_exponent = max_exponent
+        self.cells = cells
+        self.size = cells * k
+        self.bits = np.arange(k)
+
+    def encode(self, exponents):
+        flat = exponents.reshape(len(exponents), self.cells)
+        if self.k == 1:
+            return flat / float(self.max_exponent)
+        return ((flat[:, :, None] >> self.bits) & 1).reshape(len(exponents), self.size).astype(np.float64)
+
+
+# Named encoders for the command line, made for a number of cells and the largest exponent on the board
+# The wide one-hot and the exponent scale grow with the largest exponent when it does not fit their default
+ENCODERS = {
+    "onehot": lambda cells, max_exponent: OneHotEncoder(11, True, cells),
+    "onehot-wide": lambda cells, max_exponent: OneHotEncoder(max(18, max_exponent + 1), False, cells),
+    "exponent": lambda cells, max_exponent: ExponentEncoder(1, max(17, max_exponent), cells),
+    "exponent-bits": lambda cells, max_exponent: ExponentEncoder(max(5, max_exponent.bit_length()), 17, cells),
+}
+
+
+def create_encoder(name, board_size=4, max_exponent=bitboard.MAX_EXPONENT):
+    if name not in ENCODERS:
+        raise ValueError("Unknown encoder {0}, pick one of {1}".format(name, ", ".join(ENCODERS)))
+    return ENCODERS[name](board_size * board_size, max_exponent)
+
+
+# The encoder whose size matches num_inputs of a NEAT config
+def encoder_for_config(config, board_size=4, max_exponent=bitboard.MAX_EXPONENT):
+    num_inputs = config.genome_config.num_inputs
+    for name in ENCODERS:
+        encoder = create_encoder(name, board_size, max_exponent)
+        if encoder.size == num_inputs:
+            return encoder
+    raise ValueError("No encoder produces {0} inputs, set num_inputs to one of {1}".format(
+        num_inputs, ", ".join(str(create_encoder(name, board_size, max_exponent).size) for name in ENCODERS)))
+
+
+# Make a NEAT config use an encoder by setting its number of network inputs to the encoder size
+def configure_inputs(config, encoder):
+    genome_config = config.genome_config
+    genome_config.num_inputs = encoder.size
+    genome_config.input_keys = [-i - 1 for i in range(encoder.size)]
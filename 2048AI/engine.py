@@ -0,0 +1,114 @@
+import random
+import bitboard
+from grid import create_grid
+
+# Pure python 2048 game engine, no pygame in here so training can run on machines without a display
+# The board is stored packed in one integer (see bitboard.py), Board.board gives a 4x4 list of tile values
+# Positions are numbered 1 to 16, left to right and top to bottom like the original position_map
+# Other board sizes (3x3 to 8x8) and largest tiles work the same way with their own packing, see grid.py
+# Tiles are spawned from rng, the random module unless a seeded stream like game_random.GameRandom is passed in
+
+
+class Game:
+    def __init__(self, rng=None, size=4, max_exponent=bitboard.MAX_EXPONENT):
+        self.score = 0
+        self.run = True
+        self.board = Board(rng, size, max_exponent)
+
+
+class Board:
+    # Two tiles of 2 ** max_exponent do not merge
+    def __init__(self, rng=None, size=4, max_exponent=bitboard.MAX_EXPONENT):
+        self.rng = rng if rng is not None else random
+        self.grid = create_grid(size, max_exponent)
+        # The packed board, the 64 bit board from bitboard.py for 4x4, self.board is a size x size view of it
+        self.state = 0
+        self.score = 0
+        # Add two 2 or 4 tiles to random places on the board
+        self.do_move()
+        self.do_move()
+
+    # size x size list of tile values, rebuilt from the packed board on every access
+    @property
+    def board(self):
+        return self.grid.to_values(self.state)
+
+    # Every spawn draws the value first and then the position, BatchEnv.spawn draws in the same order
+    def select_two_or_four(self):
+        return 2 if self.rng.random() < 0.5 else 4
+
+    def print_board(self):
+        for row in self.board:
+            print(" ".join(str(value) for value in row))
+
+    def add_tile(self, value, position):
+        self.state = self.grid.set_exponent(self.state, position - 1, value.bit_length() - 1)
+        return value
+
+    def select_random_empty_tile(self):
+        empty = self.grid.empty_mask(self.state)
+        return self.grid.nth_empty_position(empty, int(self.rng.random() * self.grid.count_empty(empty))) + 1
+
+    # Called after a successful move, spawns the next 2 or 4 tile
+    def do_move(self):
+        self.add_tile(self.select_two_or_four(), self.select_random_empty_tile())
+
+    # Move in one of bitboard.DIRECTIONS (0 left, 1 right, 2 up, 3 down)
+    # Returns if the board changed and the number of merges we made, the score is kept on the board
+    def move(self, direction):
+        moved, merged_count, score = self.grid.move(self.state, direction)
+        changed = moved != self.state
+        self.state = moved
+        self.score += score
+        return changed, merged_count
+
+    def move_left(self):
+        return self.move(bitboard.LEFT)
+
+    def move_right(self):
+        return self.move(bitboard.RIGHT)
+
+    def move_up(self):
+        return self.move(bitboard.UP)
+
+    def move_down(self):
+        return self.move(bitboard.DOWN)
+
+    # 4 bit mask of the legal moves, bit d is set when direction d changes the board, the board is left alone
+    def legal_moves(self):
+        return self.grid.legal_mask(self.state)
+
+    def is_game_over(self):
+        return self.grid.is_terminal(self.state)
+
+    # Function to use when a move failed, make the first legal move in below order
+    def try_all_moves(self):
+        if self.try_next_move(bitboard.DIRECTIONS):
+            self.do_move()
+            return True
+        return False
+
+    # Make the first legal move in the "suggested order" from the NN output, only that move is made
+    def try_next_move(self, suggested_order):
+        legal = self.legal_moves()
+        for direction in suggested_order:
+            if legal >> direction & 1:
+                self.move(direction)
+                return True
+        return False
+
+    # The heuristics below all come from heuristics.py, one pass of row table lookups on 4x4 boards
+    def calculate_max_tile(self):
+        return 1 << self.grid.evaluate(self.state)[3]
+
+    # Number of empty tiles plus one
+    def count_zeros(self):
+        return self.grid.evaluate(self.state)[1] + 1
+
+    # In even rows if the tile to the right is the same value or double the value, add to fitness
+    # In odd rows if the tile to the right is the same value or half the value, add to fitness
+    def calculate_board_smoothness(self):
+        return self.grid.evaluate(self.state)[2]
+
+    def calculate_board_state_fitness(self):
+        return self.grid.state_fitness(self.state)
@@ -0,0 +1,293 @@
+import logging
+import neat
+import numpy as np
+from multiprocessing import Pool
+import bitboard
+from batch_env import BatchEnv
+from encoders import OneHotEncoder, encoder_for_config
+from compiled_net import create_network, activate_population
+from profiling import NULL_TIMER, PhaseTimer
+from rewards import DEFAULT_PIPELINE, Step, rewards_for_config
+
+# Genome evaluation, game_loop plays a whole generation in one batch, the seeded (parallel) evaluators below give every genome its own games
+
+logger = logging.getLogger(__name__)
+
+# Play every game in env to the end, game i is played by nets[i]
+# max_tile is the best tile seen so far, the new_max_tile reward term rewards games that beat it
+# The encoder turns the boards into network inputs, the original 432 input one-hot encoding by default
+# rewards is the rewards.RewardPipeline that shapes the fitness after every step, the original fitness by default
+# The renderer (render.Renderer or spectator.Spectator) is shown the game with the best fitness so far
+# timer collects per phase times and counters, see profiling.py
+# Returns the fitness of every game and the new best tile
+def play_games(nets, env, renderer=None, max_tile=0, encoder=None, timer=NULL_TIMER, rewards=DEFAULT_PIPELINE):
+    if encoder is None:
+        encoder = OneHotEncoder()
+    n = env.n
+    everyone = np.arange(n)
+    fitness = np.zeros(n)
+    terms = rewards.start(n)
+
+    # Game shown by the renderer
+    watched = None
+
+    while env.active.any():
+        active = env.active.copy()
+        active_indices = np.flatnonzero(active)
+        logger.debug("Number of remaining games: %d", len(active_indices))
+
+        if renderer is not None:
+            with timer.phase("render"):
+                if not renderer.pump_events():
+                    renderer.close()
+                    quit()
+                # Follow the leading game until it ends, then switch to the game leading at that point
+                if watched is None or not active[watched]:
+                    watched = active_indices[fitness[active_indices].argmax()]
+                renderer.draw_board(env.values(watched))
+
+        with timer.phase("fitness"):
+            board_max_tiles = np.where(active, env.max_tiles(), 0)
+
+        with timer.phase("encode"):
+            input_vectors = encoder.encode(env.exponents)
+        with timer.phase("activate"):
+            outputs = activate_population(nets, input_vectors, active)
+
+        with timer.phase("moves"):
+            # Order the moves by network output, ties are broken randomly
+            # for example if index 2 is largest and index 1 is second largest the order would be [2,1,0,3]
+            tie_breaks = env.tie_break_random.random_columns(4)
+            suggested_moves = np.lexsort((-tie_breaks, -outputs), axis=-1)
+            preferred = suggested_moves[:, 0]
+
+            moved_boards = env.all_moves()
+            legal = env.legal_moves()
+            preferred_legal = legal[everyone, preferred] & active
+            # First legal move in the suggested order, used when the preferred move is not possible
+            legal_in_order = np.take_along_axis(legal, suggested_moves, axis=1)
+            fallback = suggested_moves[everyone, legal_in_order.argmax(axis=1)]
+
+        with timer.phase("step"):
+            # Illegal suggestions are replaced by the next best legal move
+            changed, _, _ = env.step(np.where(preferred_legal, preferred, fallback), moved_boards)
+
+        with timer.phase("fitness"):
+            game_over = active & ~env.active
+            step = Step(env, active, board_max_tiles, max_tile, preferred, preferred_legal, moved_boards, game_over)
+            for term in terms:
+                term.apply(fitness, step)
+            max_tile = max(max_tile, int(board_max_tiles.max()))
+
+        timer.count("activations", len(active_indices))
+        timer.count("illegal_suggestions", len(active_indices) - preferred_legal.sum())
+        # Every move that changes the board spawns a tile
+        timer.count("moves", changed.sum())
+        timer.count("spawns", changed.sum())
+        timer.count("game_overs", game_over.sum())
+
+    return fitness, max_tile
+
+
+# Renderer is optional, when it is None the generation is simulated fully headless
+# All games of the generation are stepped together in one BatchEnv, finished games are masked out
+# Every genome plays `games` games and gets the mean (or quantile) of their fitness
+# The encoder turns boards into network inputs, by default the one matching num_inputs in the config
+# backend picks how networks are evaluated, see compiled_net.py
+# timer collects per phase times and counters, see profiling.py
+# board_size and max_exponent pick the board, 3x3 to 8x8 and the largest tile, see grid.py
+# seed seeds the games (anything np.random.SeedSequence takes), fresh random games every call when it is None
+def game_loop(genomes, config, renderer=None, games=1, quantile=None, encoder=None, backend="numpy", timer=NULL_TIMER,
+              board_size=4, max_exponent=bitboard.MAX_EXPONENT, seed=None):
+    nets = []
+    ge = []
+
+    # Create a list of genomes and neural networks, game i belongs to genome i
+    with timer.phase("compile"):
+        for _, g in genomes:
+            net = create_network(g, config, backend)
+            nets.append(net)
+            g.fitness = 0
+            ge.append(g)
+
+    # Game x * games + k is the k-th game of genome x
+    env = BatchEnv(len(ge) * games, seed, size=board_size, max_exponent=max_exponent)
+    if encoder is None:
+        encoder = encoder_for_config(config, board_size, max_exponent)
+    fitness, max_tile = play_games([net for net in nets for _ in range(games)], env, renderer, encoder=encoder, timer=timer,
+                                   rewards=rewards_for_config(config))
+    fitness = fitness.reshape(len(ge), games)
+    moves = env.moves.reshape(len(ge), games).sum(axis=1)
+    max_tiles = env.max_tiles().reshape(len(ge), games).max(axis=1)
+
+    logger.info("Max tile this generation: %d", max_tile)
+    if renderer is not None:
+        renderer.end_generation()
+
+    for x, g in enumerate(ge):
+        record_scores(g, summarize_scores(fitness[x], quantile, moves[x], max_tiles[x]))
+
+
+# Seed of the games a genome plays, only depends on the run seed, the generation and the genome key
+# so a genome gets the same games no matter which worker or how many workers evaluate it
+def genome_seed(seed, generation, genome_key):
+    return [seed, generation, genome_key]
+
+
+# Turn the fitness of every game a genome played into its fitness
+# The fitness is the mean, or the given quantile when one is set
+# Returns (fitness, mean, stdev, games played, moves played, max tile)
+def summarize_scores(scores, quantile=None, moves=0, max_tile=0):
+    scores = np.asarray(scores, dtype=np.float64)
+    mean = float(scores.mean())
+    fitness = mean if quantile is None else float(np.quantile(scores, quantile))
+    return fitness, mean, float(scores.std()), len(scores), int(moves), int(max_tile)
+
+
+# True once the games played so far show the genome is z standard errors below the cutoff fitness
+def clearly_worse(scores, cutoff, z):
+    if len(scores) < 2:
+        return False
+    scores = np.asarray(scores, dtype=np.float64)
+    standard_error = scores.std(ddof=1) / np.sqrt(len(scores))
+    return scores.mean() + z * standard_error < cutoff
+
+
+# Play up to `games` seeded games with one genome, `games_per_round` of them at a time in one batch
+# Round r uses seed + [r] so the same genome always gets the same games
+# board_size and max_exponent pick the board, see grid.py
+# With a cutoff the genome stops after any round where it is clearly worse than the cutoff
+# Returns what summarize_scores returns
+def eval_genome(genome, config, seed, games=1, games_per_round=None, quantile=None, cutoff=None, z=2.0, encoder=None,
+                backend="numpy", renderer=None, timer=NULL_TIMER, board_size=4, max_exponent=bitboard.MAX_EXPONENT):
+    with timer.phase("compile"):
+        net = create_network(genome, config, backend)
+    games_per_round = games_per_round or games
+    scores = []
+    moves = 0
+    max_tile = 0
+    round_number = 0
+    while len(scores) < games:
+        round_games = min(games_per_round, games - len(scores))
+        env = BatchEnv(round_games, seed + [round_number], size=board_size, max_exponent=max_exponent)
+        fitness, round_max_tile = play_games([net] * round_games, env, renderer, encoder=encoder, timer=timer,
+                                             rewards=rewards_for_config(config))
+        scores.extend(fitness)
+        moves += env.moves.sum()
+        max_tile = max(max_tile, round_max_tile)
+        round_number += 1
+        if cutoff is not None and len(scores) < games and clearly_worse(scores, cutoff, z):
+            logger.debug("Genome %d stopped after %d games", genome.key, len(scores))
+            break
+    return summarize_scores(scores, quantile, moves, max_tile)
+
+
+# eval_genome in a worker process with its own PhaseTimer, returns the result and the timer snapshot
+def timed_eval_genome(genome, config, seed, **kwargs):
+    timer = PhaseTimer()
+    result = eval_genome(genome, config, seed, timer=timer, **kwargs)
+    return result, timer.snapshot()
+
+
+# Store the result of summarize_scores on the genome so reporters can read the per genome statistics
+def record_scores(genome, result):
+    genome.fitness, genome.fitness_mean, genome.fitness_stdev, genome.games_played, genome.moves_played, genome.max_tile = result
+
+
+# Evaluates genomes one by one in this process, every genome plays its own seeded games
+# Unlike game_loop the best tile bonus is per game, not shared across the generation, so results do not depend on order
+# With adaptive set, genomes stop playing once they are clearly worse than the best fitness of the previous generation
+# A renderer is shown the games as they are played, the parallel evaluator below does not support one
+# timer collects per phase times and counters for profiling.ProfilingReporter
+class SeededEvaluator:
+    def __init__(self, seed=0, generation=0, games=1, games_per_round=None, quantile=None, adaptive=False, z=2.0, encoder=None,
+                 backend="numpy", renderer=None, timer=NULL_TIMER, board_size=4, max_exponent=bitboard.MAX_EXPONENT):
+        self.seed = seed
+        self.generation = generation
+        self.games = games
+        self.games_per_round = games_per_round
+        self.quantile = quantile
+        self.adaptive = adaptive
+        self.z = z
+        self.encoder = encoder
+        self.backend = backend
+        self.renderer = renderer
+        self.timer = timer
+        self.board_size = board_size
+        self.max_exponent = max_exponent
+        self.elite_fitness = None
+
+    def eval_kwargs(self):
+        # Adaptive rounds default to a quarter of the games so there is something to stop early
+        games_per_round = self.games_per_round
+        if self.adaptive and games_per_round is None:
+            games_per_round = max(2, self.games // 4)
+        return {"games": self.games,
+                "games_per_round": games_per_round,
+                "quantile": self.quantile,
+                "cutoff": self.elite_fitness if self.adaptive else None,
+                "z": self.z,
+                "encoder": self.encoder,
+                "backend": self.backend,
+                "board_size": self.board_size,
+                "max_exponent": self.max_exponent}
+
+    def run_jobs(self, genomes, config):
+        kwargs = self.eval_kwargs()
+        return [eval_genome(genome, config, genome_seed(self.seed, self.generation, genome_id), renderer=self.renderer,
+                            timer=self.timer, **kwargs)
+                for genome_id, genome in genomes]
+
+    def evaluate(self, genomes, config):
+        results = self.run_jobs(genomes, config)
+        for (genome_id, genome), result in zip(genomes, results):
+            record_scores(genome, result)
+        self.elite_fitness = max(result[0] for result in results)
+        self.generation += 1
+
+
+# Same games as SeededEvaluator, spread over a pool of worker processes
+class SeededParallelEvaluator(SeededEvaluator):
+    def __init__(self, num_workers, timeout=None, **kwargs):
+        SeededEvaluator.__init__(self, **kwargs)
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.pool = Pool(num_workers)
+
+    def __del__(self):
+        self.pool.close()
+        self.pool.join()
+
+    def run_jobs(self, genomes, config):
+        kwargs = self.eval_kwargs()
+        # The timer can not be shared with the workers, they send their timings back with the results instead
+        timed = self.timer is not NULL_TIMER
+        jobs = []
+        for genome_id, genome in genomes:
+            seed = genome_seed(self.seed, self.generation, genome_id)
+            jobs.append(self.pool.apply_async(timed_eval_genome if timed else eval_genome, (genome, config, seed), kwargs))
+        results = [job.get(timeout=self.timeout) for job in jobs]
+        if not timed:
+            return results
+        for _, snapshot in results:
+            self.timer.merge(snapshot)
+        return [result for result, _ in results]
+
+
+# Reports the per genome mean and stdev that the evaluators above and game_loop store on the genomes
+class FitnessStatsReporter(neat.reporting.BaseReporter):
+    def __init__(self):
+        self.generation_stats = []
+
+    def post_evaluate(self, config, population, species, best_genome):
+        genomes = [genome for genome in population.values() if hasattr(genome, "fitness_mean")]
+        if not genomes:
+            return
+        stats = {"best_mean": best_genome.fitness_mean,
+                 "best_stdev": best_genome.fitness_stdev,
+                 "best_games": best_genome.games_played,
+                 "mean_stdev": float(np.mean([genome.fitness_stdev for genome in genomes])),
+                 "games_played": int(sum(genome.games_played for genome in genomes))}
+        self.generation_stats.append(stats)
+        logger.info("Best genome fitness mean %.3f stdev %.3f over %d games, %d games played this generation",
+                    stats["best_mean"], stats["best_stdev"], stats["best_games"], stats["games_played"])
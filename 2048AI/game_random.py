@@ -0,0 +1,66 @@
+import numpy as np
+
+# Per game random streams shared by engine.Board and BatchEnv
+# Draw i of a stream is a splitmix64 hash of the stream seed and i, so a game only depends on its own seed and its moves,
+# not on how many other games are played next to it or in which order
+# engine.Board with GameRandom(seed) spawns exactly the same tiles as a BatchEnv game with the same seed
+# Works the same on python ints and numpy uint64 arrays, numpy wraps uint64 arithmetic just like the & MASK below
+
+MASK = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15
+MIX_1 = 0xBF58476D1CE4E5B9
+MIX_2 = 0x94D049BB133111EB
+# 53 random bits make a float in [0, 1), like random.random
+FLOAT_SCALE = 2.0 ** -53
+
+# Spawns and tie breaks use separate streams, so a trace only needs the moves to rebuild the tiles
+SPAWN_STREAM = 0
+TIE_BREAK_STREAM = 1
+
+
+def mix(z):
+    z = ((z ^ (z >> 30)) * MIX_1) & MASK
+    z = ((z ^ (z >> 27)) * MIX_2) & MASK
+    return z ^ (z >> 31)
+
+
+# Seed of one stream of a game, stream 0 is the game seed itself
+def stream_seed(seed, stream):
+    if stream == SPAWN_STREAM:
+        return seed
+    return mix(seed ^ ((stream * MIX_2) & MASK))
+
+
+# n 64 bit game seeds from anything np.random.SeedSequence takes, like an int or a list of ints
+def game_seeds(seed, n):
+    return np.random.SeedSequence(seed).generate_state(n, dtype=np.uint64)
+
+
+# Stream of one game, has random() so it can stand in for the random module
+class GameRandom:
+    def __init__(self, seed, stream=SPAWN_STREAM):
+        self.seed = stream_seed(int(seed) & MASK, stream)
+        self.count = 0
+
+    def random(self):
+        self.count += 1
+        return (mix((self.seed + self.count * GAMMA) & MASK) >> 11) * FLOAT_SCALE
+
+
+# Streams of many games at once, draws for a subset of the games only advance those games
+class BatchRandom:
+    def __init__(self, seeds, stream=SPAWN_STREAM):
+        self.seeds = stream_seed(np.asarray(seeds, dtype=np.uint64), stream)
+        self.counts = np.zeros(len(self.seeds), dtype=np.uint64)
+
+    # One float per game in indices, or per game when indices is None
+    def random(self, indices=None):
+        if indices is None:
+            indices = slice(None)
+        self.counts[indices] += 1
+        z = mix(self.seeds[indices] + self.counts[indices] * GAMMA)
+        return (z >> 11).astype(np.float64) * FLOAT_SCALE
+
+    # (N, k) floats, k draws from every game
+    def random_columns(self, k):
+        return np.stack([self.random() for _ in range(k)], axis=1)
@@ -0,0 +1,123 @@
+import argparse
+import struct
+import sys
+import time
+import bitboard
+from engine import Board
+from game_random import GameRandom
+
+# Compact binary game traces, the game seed and the moves are enough to play the whole game again with engine.Board
+# One trace, little endian:
+#   magic b"2048", version byte, seed u64, final board u64 (packed, see bitboard.py), final score u64, move count u32
+#   then the moves, 2 bits each and four to a byte, the first move in the lowest bits
+# A trace file is any number of traces back to back
+# Replaying checks the final board and score, so a trace is also a bit for bit regression test of the engine
+
+MAGIC = b"2048"
+VERSION = 1
+HEADER = struct.Struct("<4sBQQQI")
+
+
+class TraceError(ValueError):
+    pass
+
+
+class Trace:
+    def __init__(self, seed, moves, board, score):
+        self.seed = int(seed)
+        self.moves = [int(direction) for direction in moves]
+        self.board = int(board)
+        self.score = int(score)
+
+    def encode(self):
+        return HEADER.pack(MAGIC, VERSION, self.seed, self.board, self.score, len(self.moves)) + pack_moves(self.moves)
+
+    # Read the trace starting at offset, returns (trace, offset of whatever follows it)
+    @staticmethod
+    def decode(data, offset=0):
+        if len(data) - offset < HEADER.size:
+            raise TraceError("Trace header cut short at byte {0}".format(offset))
+        magic, version, seed, board, score, count = HEADER.unpack_from(data, offset)
+        if magic != MAGIC or version != VERSION:
+            raise TraceError("Not a version {0} trace at byte {1}".format(VERSION, offset))
+        start = offset + HEADER.size
+        end = start + (count + 3) // 4
+        if end > len(data):
+            raise TraceError("Trace moves cut short at byte {0}".format(offset))
+        return Trace(seed, unpack_moves(data[start:end], count), board, score), end
+
+
+def pack_moves(moves):
+    packed = bytearray((len(moves) + 3) // 4)
+    for i, direction in enumerate(moves):
+        packed[i >> 2] |= direction << (2 * (i & 3))
+    return bytes(packed)
+
+
+def unpack_moves(data, count):
+    return [(data[i >> 2] >> (2 * (i & 3))) & 3 for i in range(count)]
+
+
+def write_traces(path, traces):
+    with open(path, "wb") as f:
+        for trace in traces:
+            f.write(trace.encode())
+
+
+def read_traces(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    traces = []
+    offset = 0
+    while offset < len(data):
+        trace, offset = Trace.decode(data, offset)
+        traces.append(trace)
+    return traces
+
+
+# Play a trace again with engine.Board, no rendering, returns the board at the end
+def replay(trace):
+    board = Board(GameRandom(trace.seed))
+    for i, direction in enumerate(trace.moves):
+        changed, _ = board.move(direction)
+        if not changed:
+            raise TraceError("Move {0} of the trace does not change the board".format(i))
+        board.do_move()
+    return board
+
+
+# True when replaying a trace ends on the recorded board and score
+def verify(trace):
+    try:
+        board = replay(trace)
+    except TraceError:
+        return False
+    return board.state == trace.board and board.score == trace.score
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay game traces and check they end on the recorded board")
+    parser.add_argument("traces", help="Trace file, see replay.py --traces and search.py --trace")
+    parser.add_argument("--show", action="store_true", help="Print the final board of every trace")
+    args = parser.parse_args()
+
+    traces = read_traces(args.traces)
+    start = time.perf_counter()
+    mismatches = 0
+    for index, trace in enumerate(traces):
+        if not verify(trace):
+            mismatches += 1
+            print("Trace {0} (seed {1}) does not replay to the recorded board".format(index, trace.seed))
+        if args.show:
+            print("Trace {0}: score {1}, {2} moves".format(index, trace.score, len(trace.moves)))
+            bitboard.print_board(trace.board)
+    elapsed = time.perf_counter() - start
+    moves = sum(len(trace.moves) for trace in traces)
+    print("Replayed {0} traces, {1} moves in {2:.2f}s ({3:.0f} moves/s), {4} mismatches".format(
+        len(traces), moves, elapsed, moves / max(elapsed, 1e-9), mismatches))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
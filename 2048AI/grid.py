@@ -0,0 +1,203 @@
+import bitboard
+import heuristics
+
+# Board geometry for engine.Board, square boards from 3x3 to 8x8 with a configurable largest tile
+# Every grid works on boards packed into one python int, cell (row, col) is cell number size * row + col,
+# each cell cell_bits wide and holding the log2 exponent of its tile like bitboard.py
+# The standard 4x4 board with nibble cells is BITBOARD_GRID, which just uses the bitboard.py and heuristics.py tables
+# Other sizes use Grid, whose row moves are looked up in tables that are filled in as new rows show up
+
+MIN_SIZE = 3
+MAX_SIZE = 8
+# Largest exponent a grid can hold, 2 ** 31 tiles
+MAX_EXPONENT_LIMIT = 31
+# Row tables are emptied once they get this big, 8 wide rows have too many possible rows to keep them all
+MAX_TABLE_SIZE = 1 << 20
+
+
+# The 4x4 board of bitboard.py, two tiles at bitboard.MAX_EXPONENT do not merge
+class BitboardGrid:
+    size = 4
+    cells = 16
+    max_exponent = bitboard.MAX_EXPONENT
+
+    move = staticmethod(bitboard.move)
+    legal_mask = staticmethod(bitboard.legal_mask)
+    is_terminal = staticmethod(bitboard.is_terminal)
+    empty_mask = staticmethod(bitboard.empty_mask)
+    count_empty = staticmethod(bitboard.count_empty)
+    nth_empty_position = staticmethod(bitboard.nth_empty_position)
+    get_exponent = staticmethod(bitboard.get_exponent)
+    set_exponent = staticmethod(bitboard.set_exponent)
+    max_tile_exponent = staticmethod(bitboard.max_exponent)
+    to_values = staticmethod(bitboard.to_values)
+    from_values = staticmethod(bitboard.from_values)
+    evaluate = staticmethod(heuristics.evaluate)
+    state_fitness = staticmethod(heuristics.state_fitness)
+
+
+BITBOARD_GRID = BitboardGrid()
+
+
+class Grid:
+    def __init__(self, size=4, max_exponent=bitboard.MAX_EXPONENT):
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError("Board size must be between {0} and {1}, got {2}".format(MIN_SIZE, MAX_SIZE, size))
+        if not 1 <= max_exponent <= MAX_EXPONENT_LIMIT:
+            raise ValueError("Max exponent must be between 1 and {0}, got {1}".format(MAX_EXPONENT_LIMIT, max_exponent))
+        self.size = size
+        self.cells = size * size
+        self.max_exponent = max_exponent
+        self.cell_bits = max(4, max_exponent.bit_length())
+        self.cell_mask = (1 << self.cell_bits) - 1
+        self.row_bits = size * self.cell_bits
+        self.row_mask = (1 << self.row_bits) - 1
+        self.row_shifts = [row * self.row_bits for row in range(size)]
+        # row -> (moved row, merges, score) for moving a row left and right, and row -> empty cell bits
+        self.row_left = {}
+        self.row_right = {}
+        self.row_empty = {}
+
+    def row_to_cells(self, row):
+        return [(row >> (self.cell_bits * col)) & self.cell_mask for col in range(self.size)]
+
+    def cells_to_row(self, cells):
+        row = 0
+        for col, exponent in enumerate(cells):
+            row |= exponent << (self.cell_bits * col)
+        return row
+
+    # Same rules as bitboard.slide_cells_left, tiles at max_exponent do not merge
+    def slide_cells_left(self, cells):
+        tiles = [exponent for exponent in cells if exponent != 0]
+        moved = []
+        merges = 0
+        score = 0
+        i = 0
+        while i < len(tiles):
+            if i + 1 < len(tiles) and tiles[i] == tiles[i + 1] and tiles[i] < self.max_exponent:
+                moved.append(tiles[i] + 1)
+                merges += 1
+                score += 1 << (tiles[i] + 1)
+                i += 2
+            else:
+                moved.append(tiles[i])
+                i += 1
+        return moved + [0] * (self.size - len(moved)), merges, score
+
+    def slide_row(self, row, right):
+        table = self.row_right if right else self.row_left
+        entry = table.get(row)
+        if entry is None:
+            if len(table) >= MAX_TABLE_SIZE:
+                table.clear()
+            cells = self.row_to_cells(row)
+            if right:
+                moved, merges, score = self.slide_cells_left(cells[::-1])
+                moved = moved[::-1]
+            else:
+                moved, merges, score = self.slide_cells_left(cells)
+            entry = (self.cells_to_row(moved), merges, score)
+            table[row] = entry
+        return entry
+
+    def rows(self, board):
+        return [(board >> shift) & self.row_mask for shift in self.row_shifts]
+
+    def from_rows(self, rows):
+        board = 0
+        for shift, row in zip(self.row_shifts, rows):
+            board |= row << shift
+        return board
+
+    # Swap rows and columns, cell (row, col) moves to (col, row)
+    def transpose(self, board):
+        transposed = 0
+        for row in range(self.size):
+            for col in range(self.size):
+                exponent = (board >> (self.cell_bits * (self.size * row + col))) & self.cell_mask
+                transposed |= exponent << (self.cell_bits * (self.size * col + row))
+        return transposed
+
+    # Make a move in one of bitboard.DIRECTIONS, returns the new board, merge count and score delta
+    def move(self, board, direction):
+        vertical = direction in (bitboard.UP, bitboard.DOWN)
+        right = direction in (bitboard.RIGHT, bitboard.DOWN)
+        if vertical:
+            board = self.transpose(board)
+        moved_rows = []
+        merges = 0
+        score = 0
+        for row in self.rows(board):
+            moved_row, row_merges, row_score = self.slide_row(row, right)
+            moved_rows.append(moved_row)
+            merges += row_merges
+            score += row_score
+        moved = self.from_rows(moved_rows)
+        if vertical:
+            moved = self.transpose(moved)
+        return moved, merges, score
+
+    # 4 bit mask of the legal moves, like bitboard.legal_mask
+    def legal_mask(self, board):
+        mask = 0
+        columns = self.transpose(board)
+        for bit, rows, right in ((0, board, False), (1, board, True), (2, columns, False), (3, columns, True)):
+            if any(self.slide_row(row, right)[0] != row for row in self.rows(rows)):
+                mask |= 1 << bit
+        return mask
+
+    def is_terminal(self, board):
+        return self.legal_mask(board) == 0
+
+    # Mask with bit n set for every empty cell n
+    def empty_mask(self, board):
+        mask = 0
+        for row_index, row in enumerate(self.rows(board)):
+            empty = self.row_empty.get(row)
+            if empty is None:
+                empty = sum(1 << col for col, exponent in enumerate(self.row_to_cells(row)) if exponent == 0)
+                if len(self.row_empty) >= MAX_TABLE_SIZE:
+                    self.row_empty.clear()
+                self.row_empty[row] = empty
+            mask |= empty << (self.size * row_index)
+        return mask
+
+    def count_empty(self, mask):
+        return bin(mask).count("1")
+
+    def nth_empty_position(self, mask, n):
+        for _ in range(n):
+            mask &= mask - 1
+        return (mask & -mask).bit_length() - 1
+
+    def get_exponent(self, board, position):
+        return (board >> (self.cell_bits * position)) & self.cell_mask
+
+    def set_exponent(self, board, position, exponent):
+        shift = self.cell_bits * position
+        return (board & ~(self.cell_mask << shift)) | (exponent << shift)
+
+    def max_tile_exponent(self, board):
+        return max(self.get_exponent(board, position) for position in range(self.cells))
+
+    # size x size list of tile values
+    def to_values(self, board):
+        return [[1 << exponent if exponent else 0 for exponent in self.row_to_cells(row)] for row in self.rows(board)]
+
+    def from_values(self, values):
+        return self.from_rows([self.cells_to_row([value.bit_length() - 1 if value else 0 for value in row]) for row in values])
+
+    def evaluate(self, board):
+        return heuristics.evaluate_values(self.to_values(board))
+
+    def state_fitness(self, board):
+        weighted, empty, smoothness, _ = self.evaluate(board)
+        return weighted * (empty + 1) * smoothness
+
+
+# The grid for a board size and largest tile exponent, the bitboard tables for the standard 4x4 board
+def create_grid(size=4, max_exponent=bitboard.MAX_EXPONENT):
+    if size == 4 and max_exponent == bitboard.MAX_EXPONENT:
+        return BITBOARD_GRID
+    return Grid(size, max_exponent)
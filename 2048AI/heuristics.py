@@ -0,0 +1,119 @@
+import numpy as np
+import bitboard
+from table_cache import load_tables
+
+# Board heuristics computed from packed boards in one pass of 4 row lookups
+# Every term only depends on a single row, so they are precomputed for all 65536 rows at every row index
+# Used by the training fitness (Board.calculate_board_state_fitness, BatchEnv.state_fitness) and by search players
+# Other board sizes (see grid.py) use evaluate_values and state_fitness_batch, which compute the same terms directly
+
+POSITIONAL_WEIGHTS = [[16**2, 15**2, 14**2, 13**2],
+                      [9**2, 10**2, 11**2, 12**2],
+                      [8**2, 7**2, 6**2, 5**2],
+                      [4**2, 3**2, 2**2, 1**2]]
+
+
+# Squared weights falling along a snake through the board, left to right on even rows and right to left on odd ones,
+# from size ** 2 squared in the top left corner down to 1
+# 4x4 keeps the original weights above, whose last row runs the same way as the one before it
+def positional_weights(size):
+    if size == 4:
+        return POSITIONAL_WEIGHTS
+    weights = []
+    for row in range(size):
+        steps = [col if row % 2 == 0 else size - 1 - col for col in range(size)]
+        weights.append([(size * size - size * row - step) ** 2 for step in steps])
+    return weights
+
+
+# Row table entries pack every term into one int with a byte per field
+# bits 0-7 empty cells, bits 8-15 smoothness, bits 16-23 max exponent, bits 24+ weighted tile values
+# A byte is wide enough that adding the entries of all 4 rows sums every field without carrying into the next one
+EMPTY_SHIFT = 0
+SMOOTH_SHIFT = 8
+MAX_SHIFT = 16
+WEIGHTED_SHIFT = 24
+FIELD_MASK = 0xFF
+
+
+# In even rows (0, 2, ...) if the tile to the right is the same value or double the value, add to smoothness
+# In odd rows (1, 3, ...) if the tile to the right is the same value or half the value, add to smoothness
+def row_smoothness(values, row_index):
+    smoothness = 0
+    for col in range(len(values) - 1):
+        left = values[col]
+        right = values[col + 1]
+        if left == right:
+            smoothness += 1
+        elif row_index % 2 == 0 and 2 * left == right:
+            smoothness += 1
+        elif row_index % 2 == 1 and left == 2 * right:
+            smoothness += 1
+    return smoothness
+
+
+def build_row_tables():
+    tables = [[0] * 65536 for _ in range(4)]
+    for row in range(65536):
+        exponents = bitboard.row_to_cells(row)
+        values = [1 << exponent if exponent else 0 for exponent in exponents]
+        empty = exponents.count(0)
+        highest = max(exponents)
+        for row_index in range(4):
+            weighted = sum(value * weight for value, weight in zip(values, POSITIONAL_WEIGHTS[row_index]))
+            tables[row_index][row] = (empty << EMPTY_SHIFT) | (row_smoothness(values, row_index) << SMOOTH_SHIFT) | \
+                (highest << MAX_SHIFT) | (weighted << WEIGHTED_SHIFT)
+    return tables
+
+
+ROW_TERMS = load_tables("heuristics-rows", build_row_tables, [__file__, bitboard.__file__])
+
+
+# All heuristic terms of a packed board, returns (weighted tile values, empty cells, smoothness, max exponent)
+def evaluate(board):
+    row0 = ROW_TERMS[0][board & 0xFFFF]
+    row1 = ROW_TERMS[1][(board >> 16) & 0xFFFF]
+    row2 = ROW_TERMS[2][(board >> 32) & 0xFFFF]
+    row3 = ROW_TERMS[3][(board >> 48) & 0xFFFF]
+    summed = row0 + row1 + row2 + row3
+    empty = (summed >> EMPTY_SHIFT) & FIELD_MASK
+    smoothness = (summed >> SMOOTH_SHIFT) & FIELD_MASK
+    highest = max((row0 >> MAX_SHIFT) & FIELD_MASK, (row1 >> MAX_SHIFT) & FIELD_MASK,
+                  (row2 >> MAX_SHIFT) & FIELD_MASK, (row3 >> MAX_SHIFT) & FIELD_MASK)
+    return summed >> WEIGHTED_SHIFT, empty, smoothness, highest
+
+
+# evaluate for a board of any size given as a list of rows of tile values
+def evaluate_values(values):
+    weights = positional_weights(len(values))
+    weighted = sum(value * weight for row, row_weights in zip(values, weights) for value, weight in zip(row, row_weights))
+    empty = sum(row.count(0) for row in values)
+    smoothness = sum(row_smoothness(row, row_index) for row_index, row in enumerate(values))
+    highest = max(max(row) for row in values)
+    return weighted, empty, smoothness, highest.bit_length() - 1 if highest else 0
+
+
+# state_fitness of every board of an (N, size, size) exponent array
+def state_fitness_batch(exponents):
+    size = exponents.shape[-1]
+    values = np.where(exponents > 0, np.left_shift(1, exponents.astype(np.int64)), 0)
+    weighted = (values * np.array(positional_weights(size), dtype=np.int64)).sum(axis=(1, 2))
+    empty = (exponents == 0).sum(axis=(1, 2))
+    left = values[:, :, :-1]
+    right = values[:, :, 1:]
+    even_rows = (np.arange(size) % 2 == 0)[:, None]
+    smooth = (left == right) | (even_rows & (2 * left == right)) | (~even_rows & (left == 2 * right))
+    return weighted * (empty + 1) * smooth.sum(axis=(1, 2))
+
+
+# Same value as the original Board.calculate_board_state_fitness
+# weighted tile values times (empty cells + 1) times smoothness
+def state_fitness(board):
+    weighted, empty, smoothness, _ = evaluate(board)
+    return weighted * (empty + 1) * smoothness
+
+
+# state_fitness of the best oriented symmetry of the board, so any corner counts as the top left one
+# Every rotation and mirror image of a board gets the same value, which lets board_cache.BoardCache share their entries
+def symmetric_state_fitness(board):
+    return max(state_fitness(symmetry) for symmetry in bitboard.symmetries(board))
@@ -0,0 +1,320 @@
+import argparse
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import neat
+import bitboard
+from checkpoint import AsyncCheckpointer, AsyncWriter, dump, latest_checkpoint, restore_checkpoint
+from compiled_net import BACKENDS
+from encoders import ENCODERS, configure_inputs, create_encoder, encoder_for_config
+from evaluation import FitnessStatsReporter, game_loop
+from rewards import configure_rewards
+from training_log import configure_logging
+
+# Island model training, several NEAT populations evolve side by side, each in its own process
+# Islands can use different config files (like the relu and softplus ones), every few generations each island
+# sends copies of its best genomes to the next island in a ring, where they replace the newest children
+# The coordinator (the process that starts the islands) relays the migrants, gathers every island's
+# per generation statistics and keeps the best winner
+# Islands exchange genomes, so every config needs the same number of inputs, pick an encoder to set them all
+
+logger = logging.getLogger(__name__)
+
+
+def load_config(config_path):
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                              config_path)
+
+
+# Plays every generation in one batch like game_loop, seeded with [seed, island, generation] so runs can be repeated
+class IslandEvaluator:
+    def __init__(self, seed, island, generation=0, games=1, quantile=None, encoder=None, backend="numpy", board_size=4,
+                 max_exponent=bitboard.MAX_EXPONENT):
+        self.seed = seed
+        self.island = island
+        self.generation = generation
+        self.games = games
+        self.quantile = quantile
+        self.encoder = encoder
+        self.backend = backend
+        self.board_size = board_size
+        self.max_exponent = max_exponent
+
+    def evaluate(self, genomes, config):
+        game_loop(genomes, config, games=self.games, quantile=self.quantile, encoder=self.encoder, backend=self.backend,
+                  board_size=self.board_size, max_exponent=self.max_exponent, seed=[self.seed, self.island, self.generation])
+        self.generation += 1
+
+
+# Sends the best genomes of the island to the coordinator every interval generations and swaps in the migrants
+# the coordinator relays from the previous island, waiting up to timeout seconds for them
+# Migrants replace the newest children of the next generation, the elites are never replaced
+class MigrationReporter(neat.reporting.BaseReporter):
+    def __init__(self, island, reproduction, inbox, results, interval=5, migrants=2, timeout=600):
+        self.island = island
+        self.reproduction = reproduction
+        self.inbox = inbox
+        self.results = results
+        self.interval = interval
+        self.migrants = migrants
+        self.timeout = timeout
+        self.generation = None
+        self.best = []
+        # Set once the previous island has finished and no more migrants will come
+        self.upstream_done = False
+
+    # neat pickles the reporters along with the species set, the queues are left out
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["reproduction"] = None
+        state["inbox"] = None
+        state["results"] = None
+        return state
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        ranked = sorted(population.values(), key=lambda genome: genome.fitness, reverse=True)
+        self.best = [copy.deepcopy(genome) for genome in ranked[:self.migrants]]
+
+    def end_generation(self, config, population, species_set):
+        if (self.generation + 1) % self.interval != 0:
+            return
+        self.results.put(("migrants", self.island, self.generation, self.best))
+        if self.upstream_done:
+            return
+        try:
+            message = self.inbox.get(timeout=self.timeout)
+        except queue.Empty:
+            logger.warning("Island %d got no migrants after generation %d", self.island, self.generation)
+            return
+        if message is None:
+            self.upstream_done = True
+            return
+        source, _, genomes = message
+        self.immigrate(config, population, species_set, genomes)
+        logger.debug("Island %d took %d genomes from island %d", self.island, len(genomes), source)
+
+    def immigrate(self, config, population, species_set, genomes):
+        # Children get new keys, so the highest keys are the newest children and never the elites
+        for key in sorted(population)[-len(genomes):]:
+            del population[key]
+        for genome in genomes:
+            genome.key = next(self.reproduction.genome_indexer)
+            genome.fitness = None
+            population[genome.key] = genome
+        species_set.speciate(config, population, self.generation)
+
+
+# Sends a summary of every generation to the coordinator
+class IslandStatsReporter(neat.reporting.BaseReporter):
+    def __init__(self, island, config_name, results):
+        self.island = island
+        self.config_name = config_name
+        self.results = results
+        self.generation = None
+        self.start_time = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["results"] = None
+        return state
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.start_time = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        genomes = list(population.values())
+        record = {"island": self.island,
+                  "config": self.config_name,
+                  "generation": self.generation,
+                  "seconds": time.perf_counter() - self.start_time,
+                  "species": len(species.species),
+                  "best_fitness": best_genome.fitness,
+                  "mean_fitness": sum(genome.fitness for genome in genomes) / len(genomes),
+                  "max_tile": int(max(getattr(genome, "max_tile", 0) for genome in genomes)),
+                  "moves": int(sum(getattr(genome, "moves_played", 0) for genome in genomes))}
+        self.results.put(("generation", self.island, self.generation, record))
+
+
+# Evolves one island, returns (winner, config)
+# settings holds the keyword arguments of run_islands that every island shares
+def evolve_island(island, config_path, inbox, results, settings):
+    island_dir = None
+    if settings["checkpoint_dir"] is not None:
+        island_dir = os.path.join(settings["checkpoint_dir"], "island-{0}".format(island))
+    checkpoint_file = latest_checkpoint(island_dir) if settings["resume"] and island_dir is not None else None
+    stats = neat.StatisticsReporter()
+    if checkpoint_file is not None:
+        logger.info("Island %d resuming from %s", island, checkpoint_file)
+        p = restore_checkpoint(checkpoint_file, stats)
+        config = p.config
+    else:
+        config = load_config(config_path)
+        configure_rewards(config, config_path)
+    if settings["encoder_name"] is not None:
+        encoder = create_encoder(settings["encoder_name"], settings["board_size"], settings["max_exponent"])
+        configure_inputs(config, encoder)
+    else:
+        encoder = encoder_for_config(config, settings["board_size"], settings["max_exponent"])
+    if checkpoint_file is None:
+        p = neat.Population(config)
+
+    p.add_reporter(stats)
+    p.add_reporter(FitnessStatsReporter())
+    p.add_reporter(IslandStatsReporter(island, os.path.basename(config_path), results))
+    migration = MigrationReporter(island, p.reproduction, inbox, results, settings["migration_interval"],
+                                  settings["migrants"], settings["migration_timeout"])
+    p.add_reporter(migration)
+    checkpointer = None
+    if island_dir is not None:
+        checkpointer = AsyncCheckpointer(island_dir, settings["checkpoint_interval"], stats=stats)
+        p.add_reporter(checkpointer)
+
+    evaluator = IslandEvaluator(settings["seed"], island, p.generation, settings["games"], settings["quantile"], encoder,
+                                settings["backend"], settings["board_size"], settings["max_exponent"])
+    winner = p.run(evaluator.evaluate, max(settings["generations"] - p.generation, 0))
+    if checkpointer is not None:
+        checkpointer.close(winner, config)
+    return winner, config
+
+
+# Entry point of an island process, whatever happens the coordinator hears about it
+def island_process(island, config_path, inbox, results, settings):
+    configure_logging(settings["log_level"])
+    try:
+        winner, config = evolve_island(island, config_path, inbox, results, settings)
+        results.put(("done", island, None, (winner, config)))
+    except Exception:
+        logger.exception("Island %d failed", island)
+        results.put(("failed", island, None, None))
+
+
+# Starts one island per config (configs are reused in turn when there are more islands than configs),
+# relays migrants around the ring until every island is done and returns (winner, config) of the best island
+# checkpoint_dir gets an island-<n> checkpoint directory per island (see checkpoint.py), islands.jsonl with
+# a JSON line per island and generation, and winner.gz, resume continues every island from its newest checkpoint
+def run_islands(config_paths, islands=None, generations=100, migration_interval=5, migrants=2, migration_timeout=600, seed=0,
+                games=1, quantile=None, encoder_name=None, backend="numpy", checkpoint_dir=None, checkpoint_interval=5,
+                resume=False, board_size=4, max_exponent=bitboard.MAX_EXPONENT, log_level="INFO"):
+    if islands is None:
+        islands = len(config_paths)
+    island_configs = [config_paths[island % len(config_paths)] for island in range(islands)]
+    if encoder_name is None and len(set(load_config(path).genome_config.num_inputs for path in island_configs)) > 1:
+        raise ValueError("Island configs have different num_inputs, pick an encoder to give them all the same inputs")
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    settings = {"generations": generations, "migration_interval": migration_interval, "migrants": migrants,
+                "migration_timeout": migration_timeout, "seed": seed, "games": games, "quantile": quantile,
+                "encoder_name": encoder_name, "backend": backend, "checkpoint_dir": checkpoint_dir,
+                "checkpoint_interval": checkpoint_interval, "resume": resume, "board_size": board_size,
+                "max_exponent": max_exponent, "log_level": log_level}
+    results = multiprocessing.Queue()
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    processes = [multiprocessing.Process(target=island_process, args=(island, path, inboxes[island], results, settings))
+                 for island, path in enumerate(island_configs)]
+    for process in processes:
+        process.start()
+
+    running = set(range(islands))
+    winners = {}
+    generations_seen = {}
+    summary = open(os.path.join(checkpoint_dir, "islands.jsonl"), "a") if checkpoint_dir is not None else None
+    try:
+        while running:
+            kind, island, generation, payload = results.get()
+            if kind == "migrants":
+                target = (island + 1) % islands
+                if target in running and target != island:
+                    inboxes[target].put((island, generation, payload))
+            elif kind == "generation":
+                if summary is not None:
+                    summary.write(json.dumps(payload) + "\n")
+                    summary.flush()
+                records = generations_seen.setdefault(generation, {})
+                records[island] = payload
+                if len(records) >= len(running):
+                    log_generation(generation, generations_seen.pop(generation))
+            else:
+                running.discard(island)
+                # The next island would otherwise wait for migrants that never come
+                target = (island + 1) % islands
+                if target in running:
+                    inboxes[target].put(None)
+                if kind == "failed":
+                    raise RuntimeError("Island {0} failed, see its log".format(island))
+                winners[island] = payload
+                logger.info("Island %d finished", island)
+    finally:
+        if summary is not None:
+            summary.close()
+        for process in processes:
+            if running and process.is_alive():
+                process.terminate()
+        # Migrants sent to islands that already finished are never read, do not wait to flush them
+        for inbox in inboxes:
+            inbox.cancel_join_thread()
+        for process in processes:
+            process.join()
+
+    best = None
+    for island in sorted(winners):
+        winner, config = winners[island]
+        logger.info("Island %d (%s) winner fitness %.1f", island, island_configs[island], winner.fitness)
+        if best is None or winner.fitness > best[0].fitness:
+            best = (winner, config)
+    if checkpoint_dir is not None:
+        writer = AsyncWriter()
+        writer.write(os.path.join(checkpoint_dir, "winner.gz"), dump(best))
+        writer.close()
+    return best
+
+
+def log_generation(generation, records):
+    best = max(records.values(), key=lambda record: record["best_fitness"])
+    logger.info("Generation %d: best fitness %.1f on island %d, max tile %d, %s", generation, best["best_fitness"],
+                best["island"], max(record["max_tile"] for record in records.values()),
+                ", ".join("island {0} {1:.1f}".format(island, records[island]["best_fitness"]) for island in sorted(records)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train NEAT populations on islands in separate processes that trade their best genomes")
+    parser.add_argument("--configs", nargs="+", default=["config-feedforward.txt"], help="NEAT config files, in the working directory or next to this script, used by the islands in turn")
+    parser.add_argument("--islands", type=int, default=None, help="Number of islands, one per config by default")
+    parser.add_argument("--generations", type=int, default=100, help="Number of generations every island trains for")
+    parser.add_argument("--migration-interval", type=int, default=5, help="Generations between migrations")
+    parser.add_argument("--migrants", type=int, default=2, help="Best genomes every island sends to the next one")
+    parser.add_argument("--migration-timeout", type=float, default=600, help="Seconds an island waits for its migrants")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the games")
+    parser.add_argument("--games", type=int, default=1, help="Number of games every genome plays per generation")
+    parser.add_argument("--quantile", type=float, default=None, help="Score genomes by this quantile of their games instead of the mean")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default=None, help="Network input encoding, overrides num_inputs in every config")
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy", help="Compile networks to numpy matrices or use neat's own FeedForwardNetwork")
+    parser.add_argument("--board-size", type=int, default=4, help="Play on size x size boards, 3 to 8")
+    parser.add_argument("--max-exponent", type=int, default=bitboard.MAX_EXPONENT, help="Largest tile is 2 ** this")
+    parser.add_argument("--checkpoint-dir", default=None, help="Save island checkpoints, per generation statistics and the winner here")
+    parser.add_argument("--checkpoint-interval", type=int, default=5, help="Generations between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue every island from its newest checkpoint in --checkpoint-dir")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows per move detail")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    # Config files are looked up in the working directory first and then next to this script
+    local_dir = os.path.dirname(__file__)
+    config_paths = [config if os.path.exists(config) else os.path.join(local_dir, config) for config in args.configs]
+    run_islands(config_paths, args.islands, args.generations,
+                args.migration_interval, args.migrants, args.migration_timeout, args.seed, args.games, args.quantile,
+                args.encoder, args.backend, args.checkpoint_dir, args.checkpoint_interval, args.resume, args.board_size,
+                args.max_exponent, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import cProfile
+import csv
+import logging
+import os
+import time
+from contextlib import contextmanager
+import neat
+
+# Per phase timing and counters for the training loop
+# play_games times its phases (render, encode, activate, moves, fitness, step) and counts moves, activations,
+# spawns and game overs on a PhaseTimer, ProfilingReporter resets it every generation and reports the totals
+# along with the time neat itself spends between evaluations
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.times = {}
+        self.counts = {}
+
+    # with timer.phase("encode"): adds the time spent in the block to that phase
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        self.counts[name] = self.counts.get(name, 0) + int(amount)
+
+    def reset(self):
+        self.times = {}
+        self.counts = {}
+
+    def snapshot(self):
+        return {"times": dict(self.times), "counts": dict(self.counts)}
+
+    # Add a snapshot taken somewhere else, like in a worker process
+    def merge(self, snapshot):
+        for name, seconds in snapshot["times"].items():
+            self.times[name] = self.times.get(name, 0.0) + seconds
+        for name, amount in snapshot["counts"].items():
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+
+# Stands in for a PhaseTimer when nobody is profiling, so the training loop does not need to check
+class NullTimer:
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, amount=1):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+# Resets the timer when a generation starts and logs its phases and counters when the generation ends
+# "evaluate" is the time from the start of the generation to the end of the evaluation,
+# "neat" the time neat spends on reproduction and speciation after it
+# With profile_dir set every generation of this process is also run under cProfile and saved there as
+# generation-<n>.prof (read it with python -m pstats), worker processes of the parallel evaluator are not profiled
+class ProfilingReporter(neat.reporting.BaseReporter):
+    def __init__(self, timer, profile_dir=None):
+        self.timer = timer
+        self.profile_dir = profile_dir
+        self.profiler = None
+        self.generation = None
+        self.start_time = None
+        self.evaluated_time = None
+        self.generation_metrics = []
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.timer.reset()
+        if self.profile_dir is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start_time = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.evaluated_time = time.perf_counter()
+
+    def end_generation(self, config, population, species_set):
+        end_time = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(os.path.join(self.profile_dir, "generation-{0}.prof".format(self.generation)))
+            self.profiler = None
+        metrics = self.timer.snapshot()
+        metrics["times"]["evaluate"] = self.evaluated_time - self.start_time
+        metrics["times"]["neat"] = end_time - self.evaluated_time
+        metrics["generation"] = self.generation
+        self.generation_metrics.append(metrics)
+
+        # Phases are summed over the worker processes, so they are shown as shares of their own total, not of wall time
+        phase_times = sorted((name, seconds) for name, seconds in metrics["times"].items() if name not in ("evaluate", "neat"))
+        total = sum(seconds for _, seconds in phase_times)
+        phases = ", ".join("{0} {1:.3f}s ({2:.0%})".format(name, seconds, seconds / total if total > 0 else 0.0)
+                           for name, seconds in phase_times)
+        logger.info("Evaluation %.3fs, neat %.3fs; %s", metrics["times"]["evaluate"], metrics["times"]["neat"], phases)
+        logger.info("Counters: %s", ", ".join("{0} {1:d}".format(name, amount)
+                                              for name, amount in sorted(metrics["counts"].items())))
+
+    # One row per generation with every phase time and counter, like the save_* methods of neat.StatisticsReporter
+    def save_metrics(self, filename="profile.csv"):
+        times = sorted(set(name for metrics in self.generation_metrics for name in metrics["times"]))
+        counts = sorted(set(name for metrics in self.generation_metrics for name in metrics["counts"]))
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["generation"] + [name + "_seconds" for name in times] + counts)
+            for metrics in self.generation_metrics:
+                writer.writerow([metrics["generation"]] + [metrics["times"].get(name, 0.0) for name in times]
+                                + [metrics["counts"].get(name, 0) for name in counts])
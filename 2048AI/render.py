@@ -0,0 +1,94 @@
+import pygame
+import os
+import time
+
+# Optional pygame renderer, the engine never imports this so training can run headless
+# A Renderer observes 4x4 grids of tile values and draws them, it never changes game state
+# Only tiles that changed since the last frame are redrawn, see spectator.py for drawing from another process
+
+# Set pixel values for the game window
+WIN_WIDTH = 1000
+WIN_HEIGHT = 1000
+TILE_WIDTH = 28
+TILE_HEIGHT = 32
+TILE_SPACING = 242
+
+IMAGE_VALUES = [0, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048]
+# Tiles above 2048 have no image, they are drawn on a blank 2048 tile with their value written on it
+LARGEST_IMAGE = 2048
+LARGE_TILE_FONT_SIZE = 90
+
+
+# (row, col, x, y) of every cell, indexed by position 0 to 15, with the pixel position of its tile
+TILE_POSITIONS = [(i // 4, i % 4, TILE_WIDTH + (i % 4) * TILE_SPACING, TILE_HEIGHT + (i // 4) * TILE_SPACING)
+                  for i in range(16)]
+
+
+def load_image(path):
+    return pygame.image.load(path).convert_alpha()
+
+
+class Renderer:
+    def __init__(self, image_dir="imgs"):
+        pygame.font.init()
+        self.win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        # Load images once the window exists instead of at import time, converted to the display format once
+        # so blitting them does not convert every frame, the images have an alpha channel so convert_alpha keeps it
+        self.board_image = load_image(os.path.join(image_dir, "BaseBoard.png"))
+        self.integer_to_image_map = {value: load_image(os.path.join(image_dir, str(value) + ".png")) for value in IMAGE_VALUES}
+        self.stat_font = pygame.font.SysFont("comicsans", 50)
+        # Value drawn at every position, None until the first full frame
+        self.drawn = [None] * 16
+
+    # Image of a tile value, made and cached the first time a value above 2048 shows up
+    def tile_image(self, value):
+        image = self.integer_to_image_map.get(value)
+        if image is None:
+            image = self.integer_to_image_map[LARGEST_IMAGE].copy()
+            # Paint over the 2048 text with the tile colour, then write the value in a size that fits the tile
+            inner = image.get_rect().inflate(-16, -16)
+            image.fill(image.get_at(inner.topleft), inner)
+            font_size = LARGE_TILE_FONT_SIZE
+            text = pygame.font.Font(None, font_size).render(str(value), True, (255, 255, 255))
+            while text.get_width() > inner.width and font_size > 10:
+                font_size -= 10
+                text = pygame.font.Font(None, font_size).render(str(value), True, (255, 255, 255))
+            image.blit(text, text.get_rect(center=image.get_rect().center))
+            self.integer_to_image_map[value] = image
+        return image
+
+    # Draw the tiles that changed since the last frame and push only their rectangles to the display
+    def draw_board(self, values):
+        first_frame = self.drawn[0] is None
+        if first_frame:
+            self.win.blit(self.board_image, (0, 0))
+        dirty = []
+        for position, (row, col, x, y) in enumerate(TILE_POSITIONS):
+            value = int(values[row][col])
+            if value == self.drawn[position]:
+                continue
+            image = self.tile_image(value)
+            rect = image.get_rect(topleft=(x, y))
+            # Put the empty board back under the tile first, the tile images are partly transparent
+            self.win.blit(self.board_image, rect, rect)
+            self.win.blit(image, rect)
+            self.drawn[position] = value
+            dirty.append(rect)
+        if first_frame:
+            pygame.display.update()
+        elif dirty:
+            pygame.display.update(dirty)
+
+    # Called between generations, leaves the last board of the generation on screen for a while
+    def end_generation(self):
+        time.sleep(5)
+
+    # Handle window events, returns False once the window has been closed
+    def pump_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        return True
+
+    def close(self):
+        pygame.quit()
@@ -0,0 +1,71 @@
+import argparse
+import logging
+import os
+import numpy as np
+import bitboard
+from batch_env import BatchEnv
+from checkpoint import load_genome
+from compiled_net import BACKENDS, create_network
+from encoders import ENCODERS, create_encoder, encoder_for_config
+from evaluation import play_games
+from game_trace import write_traces
+from rewards import rewards_for_config
+from training_log import configure_logging
+
+# Play a saved genome (winner.gz or best-<generation>.gz from a checkpoint directory) without retraining
+# Headless by default, --render draws the first game that is still running
+
+logger = logging.getLogger(__name__)
+
+
+# Play `games` seeded games with a saved genome, returns the BatchEnv after the games and the fitness of every game
+# With record=True the moves are kept, env.trace(i) then gives the trace of game i
+# board_size and max_exponent have to match the board the genome was trained on
+def replay_genome(path, games=1, seed=0, encoder_name=None, backend="numpy", renderer=None, record=False, board_size=4,
+                  max_exponent=bitboard.MAX_EXPONENT):
+    genome, config = load_genome(path)
+    if encoder_name is not None:
+        encoder = create_encoder(encoder_name, board_size, max_exponent)
+    else:
+        encoder = encoder_for_config(config, board_size, max_exponent)
+    net = create_network(genome, config, backend)
+    env = BatchEnv(games, seed, record=record, size=board_size, max_exponent=max_exponent)
+    fitness, _ = play_games([net] * games, env, renderer, encoder=encoder, rewards=rewards_for_config(config))
+    return env, fitness
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or evaluate a saved genome")
+    parser.add_argument("genome", help="Saved genome file, like checkpoints/winner.gz")
+    parser.add_argument("--games", type=int, default=1, help="Number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the games")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default=None, help="Input encoding, by default the one matching the saved config")
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy", help="Network backend, see compiled_net.py")
+    parser.add_argument("--board-size", type=int, default=4, help="Board size the genome was trained on")
+    parser.add_argument("--max-exponent", type=int, default=bitboard.MAX_EXPONENT, help="Largest tile exponent the genome was trained with")
+    parser.add_argument("--render", action="store_true", help="Draw the games with pygame")
+    parser.add_argument("--traces", default=None, help="Save the trace of every game to this file, see game_trace.py")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows per move detail")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    renderer = None
+    if args.render:
+        from render import Renderer
+        renderer = Renderer(os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs"))
+
+    env, fitness = replay_genome(args.genome, args.games, args.seed, args.encoder, args.backend, renderer,
+                                 args.traces is not None, args.board_size, args.max_exponent)
+    max_tiles = env.max_tiles()
+    logger.info("Played %d games", args.games)
+    logger.info("Fitness mean %.3f stdev %.3f max %.3f", fitness.mean(), fitness.std(), fitness.max())
+    logger.info("Score mean %.1f max %d, moves mean %.1f", env.score.mean(), env.score.max(), env.moves.mean())
+    for tile, count in zip(*np.unique(max_tiles, return_counts=True)):
+        logger.info("Max tile %d in %d games", tile, count)
+    if args.traces is not None:
+        write_traces(args.traces, [env.trace(i) for i in range(args.games)])
+        logger.info("Saved %d traces to %s", args.games, args.traces)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+from configparser import ConfigParser
+import numpy as np
+
+# Fitness shaping of play_games as a pipeline of reward terms, each term updates the fitness of every game
+# of a batch at once after every step, in the order they are listed
+# The pipeline is read from an optional [Fitness] section of the NEAT config file, for example
+#
+#   [Fitness]
+#   terms                 = move_bonus new_max_tile board_state illegal_move game_over move_variety
+#   move_bonus_amount     = 500
+#   illegal_move_factor   = 0.75
+#
+# Parameters are <term>_<parameter>, anything left out keeps the default below
+# Without a [Fitness] section the default pipeline is the original fitness of the training loop
+
+SECTION = "Fitness"
+
+
+# What happened in one step of a batch, every array has one entry per game
+# active are the games that were still playing, max_tiles their best tile before the move (0 for finished games)
+# best_tile is the best tile of the generation before the step
+# directions are the moves the networks preferred and legal tells whether those were possible,
+# moved_boards is BatchEnv.all_moves() from before the step and game_over the games that just ended
+class Step:
+    def __init__(self, env, active, max_tiles, best_tile, directions, legal, moved_boards, game_over):
+        self.env = env
+        self.active = active
+        self.max_tiles = max_tiles
+        self.best_tile = best_tile
+        self.directions = directions
+        self.legal = legal
+        self.moved_boards = moved_boards
+        self.game_over = game_over
+
+
+# Every move adds amount
+class MoveBonus:
+    defaults = {"amount": 500.0}
+
+    def __init__(self, n, amount):
+        self.amount = amount
+
+    def apply(self, fitness, step):
+        fitness[step.active] += self.amount
+
+
+# Any game that beats the best tile seen so far multiplies its fitness by factor
+# Games are checked in order, so only the first of several games reaching a new tile in the same step gets it
+class NewMaxTile:
+    defaults = {"factor": 2.0}
+
+    def __init__(self, n, factor):
+        self.factor = factor
+
+    def apply(self, fitness, step):
+        best_before = np.maximum.accumulate(np.concatenate(([step.best_tile], step.max_tiles[:-1])))
+        fitness[step.max_tiles > best_before] *= self.factor
+
+
+# The board state fitness (heuristics.state_fitness) after a legal preferred move, before the new tile spawns,
+# times merge_factor per merge when the move merged tiles
+class BoardState:
+    defaults = {"merge_factor": 10.0}
+
+    def __init__(self, n, merge_factor):
+        self.merge_factor = merge_factor
+        self.everyone = np.arange(n)
+
+    def apply(self, fitness, step):
+        moved, merges, _ = step.moved_boards
+        after_move = moved[step.directions, self.everyone]
+        move_merges = merges[step.directions, self.everyone]
+        state_fitness = step.env.state_fitness(after_move)
+        fitness += np.where(step.legal, state_fitness * np.where(move_merges > 0, move_merges * self.merge_factor, 1), 0)
+
+
+# Illegal preferred moves multiply the fitness by factor, the next best legal move is made instead
+class IllegalMove:
+    defaults = {"factor": 0.75}
+
+    def __init__(self, n, factor):
+        self.factor = factor
+
+    def apply(self, fitness, step):
+        fitness[step.active & ~step.legal] *= self.factor
+
+
+# Ending the game multiplies the fitness by factor
+class GameOver:
+    defaults = {"factor": 0.5}
+
+    def __init__(self, n, factor):
+        self.factor = factor
+
+    def apply(self, fitness, step):
+        fitness[step.game_over] *= self.factor
+
+
+# Games that used fewer than 4 directions in their last `window` legal preferred moves are multiplied by penalty,
+# the others by bonus
+class MoveVariety:
+    defaults = {"window": 24, "penalty": 0.5, "bonus": 1.1}
+
+    def __init__(self, n, window, penalty, bonus):
+        self.window = window
+        self.penalty = penalty
+        self.bonus = bonus
+        # Ring buffer of the last moves of every game, -1 means no move yet
+        self.moves_list = np.full((n, window), -1, dtype=np.int64)
+        self.moves_made = np.zeros(n, dtype=np.int64)
+
+    def apply(self, fitness, step):
+        legal = step.legal
+        self.moves_list[legal, self.moves_made[legal] % self.window] = step.directions[legal]
+        self.moves_made += legal
+        distinct_moves = (self.moves_list[:, :, None] == np.arange(4)).any(axis=1).sum(axis=1)
+        still_playing = step.active & ~step.game_over
+        fitness[still_playing & (distinct_moves < 4)] *= self.penalty
+        fitness[still_playing & (distinct_moves == 4) & (fitness > 0)] *= self.bonus
+
+
+TERMS = {
+    "move_bonus": MoveBonus,
+    "new_max_tile": NewMaxTile,
+    "board_state": BoardState,
+    "illegal_move": IllegalMove,
+    "game_over": GameOver,
+    "move_variety": MoveVariety,
+}
+
+DEFAULT_TERMS = ("move_bonus", "new_max_tile", "board_state", "illegal_move", "game_over", "move_variety")
+
+
+# Which terms to apply in which order and their parameters, start() creates the terms for one batch of games
+class RewardPipeline:
+    def __init__(self, terms=DEFAULT_TERMS, parameters=None):
+        parameters = parameters or {}
+        unknown = [name for name in list(terms) + list(parameters) if name not in TERMS]
+        if unknown:
+            raise ValueError("Unknown reward terms {0}, pick from {1}".format(", ".join(unknown), ", ".join(sorted(TERMS))))
+        self.terms = tuple(terms)
+        self.parameters = {}
+        for name in self.terms:
+            values = dict(TERMS[name].defaults)
+            for key, value in parameters.get(name, {}).items():
+                if key not in values:
+                    raise ValueError("Unknown parameter {0} of reward term {1}".format(key, name))
+                values[key] = type(values[key])(value)
+            self.parameters[name] = values
+
+    def start(self, n):
+        return [TERMS[name](n, **self.parameters[name]) for name in self.terms]
+
+    # Pipeline of a [Fitness] section given as a dict of its items, the default pipeline for an empty one
+    @staticmethod
+    def from_section(items):
+        items = dict(items)
+        terms = items.pop("terms", None)
+        terms = DEFAULT_TERMS if terms is None else terms.replace(",", " ").split()
+        parameters = {}
+        for key, value in items.items():
+            # Term names contain underscores too, so match the longest term name the key starts with
+            names = [name for name in TERMS if key.startswith(name + "_")]
+            if not names:
+                raise ValueError("Unknown [{0}] item {1}".format(SECTION, key))
+            name = max(names, key=len)
+            parameters.setdefault(name, {})[key[len(name) + 1:]] = value
+        return RewardPipeline(terms, parameters)
+
+    @staticmethod
+    def from_file(config_path):
+        parser = ConfigParser()
+        with open(config_path) as f:
+            parser.read_file(f)
+        return RewardPipeline.from_section(parser.items(SECTION) if parser.has_section(SECTION) else [])
+
+
+DEFAULT_PIPELINE = RewardPipeline()
+
+
+# Read the [Fitness] section of the NEAT config file into config.rewards, so it is saved along with checkpoints
+# and genomes and reaches worker processes with the config
+def configure_rewards(config, config_path):
+    config.rewards = RewardPipeline.from_file(config_path)
+    return config.rewards
+
+
+# The reward pipeline of a config, the default one for configs loaded without configure_rewards
+def rewards_for_config(config):
+    return getattr(config, "rewards", DEFAULT_PIPELINE)
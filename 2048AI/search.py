@@ -0,0 +1,155 @@
+import argparse
+import random
+import time
+import bitboard
+import heuristics
+from board_cache import BoardCache, CachedEvaluator
+from engine import Board
+from game_random import GameRandom
+from game_trace import Trace, write_traces
+
+# Expectimax search player working directly on packed boards from bitboard.py
+# Max nodes pick a move, chance nodes average over every spawn (a 2 or a 4 on any empty cell, like Board.do_move)
+# Leaves are scored with heuristics.state_fitness, the same heuristic as Board.calculate_board_state_fitness
+# Chance node values and leaf scores are kept in bounded board_cache.BoardCache tables, with symmetric=True
+# (for evaluators like heuristics.symmetric_state_fitness) all 8 rotations and mirror images of a board share an entry
+
+# Board.select_two_or_four picks 2 and 4 with the same probability
+SPAWN_PROBABILITIES = ((1, 0.5), (2, 0.5))
+
+class SearchTimeout(Exception):
+    pass
+
+
+class ExpectimaxPlayer:
+    # depth is the number of own moves to look ahead
+    # time_budget (seconds per move) turns on iterative deepening up to depth, the last completed depth is used
+    # Chance branches less likely than min_probability are cut off and scored with the evaluator
+    # max_table_size bounds the entries of each cache, symmetric has to be False unless evaluate scores
+    # every symmetry of a board the same
+    def __init__(self, depth=3, time_budget=None, evaluate=heuristics.state_fitness, min_probability=1e-4, max_table_size=1000000,
+                 symmetric=False):
+        self.depth = depth
+        self.time_budget = time_budget
+        self.evaluate = evaluate
+        self.min_probability = min_probability
+        self.max_table_size = max_table_size
+        # Transposition table, (board, depth left) -> expected value of the chance node
+        self.table = BoardCache(max_table_size, symmetric)
+        self.evaluate_leaf = CachedEvaluator(evaluate, max_table_size, symmetric)
+        self.deadline = None
+        self.nodes = 0
+
+    # Best direction for the board, or None when no move is possible
+    def choose_move(self, board):
+        moves = [direction for direction in bitboard.DIRECTIONS if bitboard.move(board, direction)[0] != board]
+        if not moves:
+            return None
+
+        if self.time_budget is None:
+            return self.search_root(board, moves, self.depth)[0][0]
+
+        self.deadline = time.perf_counter() + self.time_budget
+        best = moves[0]
+        try:
+            for depth in range(1, self.depth + 1):
+                ranked = self.search_root(board, moves, depth)
+                best = ranked[0][0]
+                # Move ordering, search the best move of this depth first on the next one
+                moves = [direction for direction, _ in ranked]
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+        return best
+
+    # Returns (direction, value) for every move, best first
+    def search_root(self, board, moves, depth):
+        ranked = []
+        for direction in moves:
+            moved = bitboard.move(board, direction)[0]
+            ranked.append((direction, self.chance_node(moved, depth - 1, 1.0)))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked
+
+    def max_node(self, board, depth, probability):
+        best = 0
+        for direction in bitboard.DIRECTIONS:
+            moved = bitboard.move(board, direction)[0]
+            if moved != board:
+                value = self.chance_node(moved, depth, probability)
+                if value > best:
+                    best = value
+        return best
+
+    def chance_node(self, board, depth, probability):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if depth == 0 or probability < self.min_probability:
+            return self.evaluate_leaf(board)
+        cached = self.table.get(board, depth)
+        if cached is not None:
+            return cached
+
+        empty = bitboard.empty_positions(board)
+        total = 0.0
+        for position in empty:
+            for exponent, spawn_probability in SPAWN_PROBABILITIES:
+                spawned = board | (exponent << (4 * position))
+                total += spawn_probability * self.max_node(spawned, depth - 1, probability * spawn_probability / len(empty))
+        value = total / len(empty)
+        self.table.put(board, value, depth)
+        return value
+
+    def cache_stats(self):
+        return {"table": self.table.stats(), "leaves": self.evaluate_leaf.cache.stats()}
+
+
+# Play one game on an engine Board with the player, returns the board and the number of moves made
+# Every move made is appended to record when one is given
+def play_game(player, board=None, record=None):
+    if board is None:
+        board = Board()
+    moves = 0
+    while True:
+        direction = player.choose_move(board.state)
+        if direction is None:
+            return board, moves
+        board.move(direction)
+        board.do_move()
+        moves += 1
+        if record is not None:
+            record.append(direction)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a game of 2048 with the expectimax player")
+    parser.add_argument("--depth", type=int, default=3, help="Number of moves to look ahead")
+    parser.add_argument("--time-budget", type=float, default=None, help="Seconds per move, searches deeper until it runs out")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the game, random when not set")
+    parser.add_argument("--trace", default=None, help="Save the game trace to this file, see game_trace.py")
+    parser.add_argument("--table-size", type=int, default=1000000, help="Entries kept in each search cache")
+    parser.add_argument("--symmetric", action="store_true",
+                        help="Score leaves with heuristics.symmetric_state_fitness and share cache entries between symmetric boards")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.getrandbits(64)
+    evaluate = heuristics.symmetric_state_fitness if args.symmetric else heuristics.state_fitness
+    player = ExpectimaxPlayer(args.depth, args.time_budget, evaluate, max_table_size=args.table_size, symmetric=args.symmetric)
+    record = []
+    start = time.perf_counter()
+    board, moves = play_game(player, Board(GameRandom(seed)), record)
+    elapsed = time.perf_counter() - start
+    board.print_board()
+    print("Score:", board.score, "Moves:", moves, "Max tile:", 1 << bitboard.max_exponent(board.state))
+    print("Average time per move: {0:.4f}s".format(elapsed / max(moves, 1)))
+    for name, stats in sorted(player.cache_stats().items()):
+        print("Cache {0}: {1} entries, {2:.1%} hit rate, {3} evictions".format(name, stats["size"], stats["hit_rate"],
+                                                                                 stats["evictions"]))
+    if args.trace is not None:
+        write_traces(args.trace, [Trace(seed, record, board.state, board.score)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import os
+import time
+import numpy as np
+from batch_env import BatchEnv, pack_boards
+from checkpoint import load_genome
+from compiled_net import BACKENDS, activate_batch, create_network
+from encoders import encoder_for_config
+from search import ExpectimaxPlayer
+from training_log import configure_logging
+
+# Self-play dataset generator, plays games headless with a policy and saves every move as a transition
+# A dataset is a directory of chunk-<n>.npy files, each a numpy array of TRANSITION records,
+# so np.load(path, mmap_mode="r") (or load_dataset) maps them without reading them into memory
+# Games are stepped together in a BatchEnv, which moves boards with the same row tables as engine.Board
+# The reward is the per move shaping of play_games: the board state fitness after the move, times 10 per merge
+
+logger = logging.getLogger(__name__)
+
+# board and next_board are packed boards (see bitboard.py), next_board has the new tile spawned,
+# done is 1 on the last move of a game
+TRANSITION = np.dtype([("board", "<u8"), ("move", "u1"), ("reward", "<f4"), ("score", "<u4"), ("next_board", "<u8"),
+                       ("done", "u1")])
+
+
+# Writes transitions in fixed size chunks, rows are collected in a buffer and written one chunk at a time
+class TransitionWriter:
+    def __init__(self, directory, chunk_size=1 << 20):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.buffer = np.zeros(chunk_size, dtype=TRANSITION)
+        self.filled = 0
+        self.chunks = 0
+        self.rows = 0
+        os.makedirs(directory, exist_ok=True)
+        # Chunks of an older dataset would be loaded along with the new ones
+        if load_dataset(directory):
+            raise ValueError("{0} already holds a dataset".format(directory))
+
+    def write(self, records):
+        start = 0
+        while start < len(records):
+            count = min(len(records) - start, self.chunk_size - self.filled)
+            self.buffer[self.filled:self.filled + count] = records[start:start + count]
+            self.filled += count
+            start += count
+            if self.filled == self.chunk_size:
+                self.flush()
+
+    # Write whatever is buffered as a chunk, only the last chunk of a dataset is shorter than chunk_size
+    def flush(self):
+        if self.filled == 0:
+            return
+        np.save(os.path.join(self.directory, "chunk-{0:05d}.npy".format(self.chunks)), self.buffer[:self.filled])
+        self.chunks += 1
+        self.rows += self.filled
+        self.filled = 0
+
+    # Flush and save what the dataset holds and how it was made next to the chunks
+    def close(self, info=None):
+        self.flush()
+        meta = {"rows": self.rows, "chunks": self.chunks, "chunk_size": self.chunk_size, "dtype": TRANSITION.descr}
+        meta.update(info or {})
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+# Memory mapped chunks of a dataset, in order
+def load_dataset(directory):
+    names = sorted(name for name in os.listdir(directory) if name.startswith("chunk-") and name.endswith(".npy"))
+    return [np.load(os.path.join(directory, name), mmap_mode="r") for name in names]
+
+
+# Policies pick a direction for every active game of a BatchEnv, given the four moved boards and the legal moves
+
+
+# Uniformly random legal move
+def random_policy(env, moved_boards, legal):
+    keys = np.where(legal, env.tie_break_random.random_columns(4), -1.0)
+    return keys.argmax(axis=1)
+
+
+# Legal move with the best board state fitness right after the move
+def heuristic_policy(env, moved_boards, legal):
+    fitness = np.stack([env.state_fitness(moved) for moved in moved_boards[0]], axis=1)
+    return np.where(legal, fitness, -1).argmax(axis=1)
+
+
+# Expectimax search, one game at a time
+class SearchPolicy:
+    def __init__(self, depth=2):
+        self.player = ExpectimaxPlayer(depth)
+
+    def __call__(self, env, moved_boards, legal):
+        directions = np.zeros(env.n, dtype=np.int64)
+        boards = pack_boards(env.exponents)
+        for index in np.flatnonzero(env.active):
+            directions[index] = self.player.choose_move(int(boards[index]))
+        return directions
+
+
+# The move a saved genome rates highest among the legal ones
+class GenomePolicy:
+    def __init__(self, path, backend="numpy"):
+        genome, config = load_genome(path)
+        self.net = create_network(genome, config, backend)
+        self.encoder = encoder_for_config(config)
+
+    def __call__(self, env, moved_boards, legal):
+        outputs = np.zeros((env.n, 4))
+        active = np.flatnonzero(env.active)
+        outputs[active] = activate_batch(self.net, self.encoder.encode(env.exponents)[active])
+        return np.where(legal, outputs, -np.inf).argmax(axis=1)
+
+
+POLICIES = ("random", "heuristic", "search", "genome")
+
+
+def create_policy(name, genome_path=None, depth=2, backend="numpy"):
+    if name == "random":
+        return random_policy
+    if name == "heuristic":
+        return heuristic_policy
+    if name == "search":
+        return SearchPolicy(depth)
+    if name == "genome":
+        if genome_path is None:
+            raise ValueError("The genome policy needs a saved genome")
+        return GenomePolicy(genome_path, backend)
+    raise ValueError("Unknown policy {0}, pick one of {1}".format(name, ", ".join(POLICIES)))
+
+
+# Play one batch of games to the end, every move is handed to the writer as it is made
+def play_batch(env, policy, writer):
+    everyone = np.arange(env.n)
+    while env.active.any():
+        active = env.active.copy()
+        moved_boards = env.all_moves()
+        legal = env.legal_moves()
+        directions = policy(env, moved_boards, legal)
+
+        moved, merges, _ = moved_boards
+        after_move = moved[directions[active], everyone[active]]
+        move_merges = merges[directions[active], everyone[active]]
+        reward = env.state_fitness(after_move) * np.where(move_merges > 0, move_merges * 10, 1)
+
+        records = np.zeros(int(active.sum()), dtype=TRANSITION)
+        records["board"] = pack_boards(env.exponents[active])
+        records["move"] = directions[active]
+        records["reward"] = reward
+        _, _, step_score = env.step(directions, moved_boards)
+        records["score"] = step_score[active]
+        records["next_board"] = pack_boards(env.exponents[active])
+        records["done"] = ~env.active[active]
+        writer.write(records)
+
+
+# Play `games` games in batches of batch_size, batch b is seeded with [seed, b], returns the number of transitions
+def generate(directory, policy, games, batch_size=1024, seed=0, chunk_size=1 << 20, info=None):
+    writer = TransitionWriter(directory, chunk_size)
+    start = time.perf_counter()
+    played = 0
+    batch = 0
+    while played < games:
+        env = BatchEnv(min(batch_size, games - played), [seed, batch])
+        play_batch(env, policy, writer)
+        played += env.n
+        batch += 1
+        elapsed = time.perf_counter() - start
+        logger.info("%d games, %d transitions, %.0f transitions/s, max tile %d", played, writer.rows + writer.filled,
+                    (writer.rows + writer.filled) / elapsed, int(env.max_tiles().max()))
+    meta = {"games": games, "seed": seed, "batch_size": batch_size}
+    meta.update(info or {})
+    writer.close(meta)
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games headless and save every move as a transition dataset")
+    parser.add_argument("output", help="Dataset directory")
+    parser.add_argument("--policy", choices=POLICIES, default="heuristic", help="Who picks the moves")
+    parser.add_argument("--genome", default=None, help="Saved genome for the genome policy, like checkpoints/winner.gz")
+    parser.add_argument("--depth", type=int, default=2, help="Search depth of the search policy")
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy", help="Network backend of the genome policy")
+    parser.add_argument("--games", type=int, default=10000, help="Number of games to play")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Games stepped together")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="Transitions per chunk file")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the games")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows per move detail")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    policy = create_policy(args.policy, args.genome, args.depth, args.backend)
+    info = {"policy": args.policy, "genome": args.genome, "depth": args.depth}
+    rows = generate(args.output, policy, args.games, args.batch_size, args.seed, args.chunk_size, info)
+    logger.info("Saved %d transitions to %s", rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
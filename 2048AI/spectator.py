@@ -0,0 +1,55 @@
+import multiprocessing
+
+# Spectator mode, a separate process draws the watched game while training keeps running at full speed
+# The training side only writes the newest board into shared memory and never waits for the display
+# The spectator process draws whatever board is newest at a capped frame rate, boards in between are skipped
+# pygame is only imported in the spectator process
+
+
+# Runs in the spectator process until its window is closed
+def spectate(image_dir, fps, frame, sequence):
+    import pygame
+    from render import Renderer
+    renderer = Renderer(image_dir)
+    clock = pygame.time.Clock()
+    shown = -1
+    while renderer.pump_events():
+        with frame.get_lock():
+            current = sequence.value
+            values = frame[:]
+        if current != shown:
+            renderer.draw_board([values[4 * row:4 * row + 4] for row in range(4)])
+            shown = current
+        clock.tick(fps)
+    renderer.close()
+
+
+# Same draw_board and pump_events as render.Renderer, so play_games can use either
+class Spectator:
+    def __init__(self, image_dir="imgs", fps=30):
+        self.frame = multiprocessing.Array("q", 16)
+        # Guarded by the frame lock
+        self.sequence = multiprocessing.Value("q", 0, lock=False)
+        self.process = multiprocessing.Process(target=spectate, args=(image_dir, fps, self.frame, self.sequence), daemon=True)
+        self.process.start()
+
+    # Publish the newest board, does nothing once the spectator window has been closed
+    def draw_board(self, values):
+        if not self.process.is_alive():
+            return
+        flat = [int(value) for row in values for value in row]
+        with self.frame.get_lock():
+            self.frame[:] = flat
+            self.sequence.value += 1
+
+    # Closing the spectator window only stops the drawing, training goes on
+    def pump_events(self):
+        return True
+
+    def end_generation(self):
+        pass
+
+    def close(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
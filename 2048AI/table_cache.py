@@ -0,0 +1,55 @@
+import hashlib
+import logging
+import os
+import pickle
+
+# Lookup tables built once and kept on disk, so later imports (and every worker process) load them in milliseconds
+# instead of building them again
+# A cached table is keyed by its name and a hash of the source files that build it, so editing those files
+# builds it again, the directory is $NEAT2048_CACHE_DIR or ~/.cache/2048ai and NEAT2048_CACHE_DIR=off turns caching off
+# A cache that can not be read or written is ignored and the table is built in memory
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENV = "NEAT2048_CACHE_DIR"
+
+
+def cache_dir():
+    return os.environ.get(CACHE_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "2048ai")
+
+
+def source_hash(sources):
+    digest = hashlib.sha1()
+    for path in sources:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# build() returns the tables, sources are the files whose contents they depend on
+def load_tables(name, build, sources):
+    directory = cache_dir()
+    if directory == "off":
+        return build()
+    path = os.path.join(directory, "{0}-{1}.pickle".format(name, source_hash(sources)))
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    tables = build()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Written to a temporary name first so processes starting at the same time never read half a file
+        temporary = "{0}.{1}.tmp".format(path, os.getpid())
+        with open(temporary, "wb") as f:
+            pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        # Tables built by older versions of the sources are never read again
+        for stale in os.listdir(directory):
+            if stale.startswith(name + "-") and stale.endswith(".pickle") and stale != os.path.basename(path):
+                os.remove(os.path.join(directory, stale))
+    except OSError as e:
+        logger.debug("Could not cache %s tables: %s", name, e)
+    return tables
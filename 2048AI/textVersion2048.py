@@ -1,12 +1,3 @@
-board = [[16,16,0,2],
-        [4,4,4,0],
-        [4,2,2,2],
-        [2,2,4,2]]
-
-
-for row in board:
-    print(row)
-
 def move_left(board):
     changed = False
     for row in board:
@@ -45,8 +36,18 @@ def move_down(board):
     board = list(map(list, zip(*[row[::-1] for row in board_transposed_reversed])))
     return board, changed
 
-print("_________________________")
-board, changed = move_down(board)
-for row in board:
-    print(row)
-print(changed)  
+if __name__ == "__main__":
+    board = [[16,16,0,2],
+            [4,4,4,0],
+            [4,2,2,2],
+            [2,2,4,2]]
+
+    for row in board:
+        print(row)
+
+    print("_________________________")
+    board, changed = move_down(board)
+    for row in board:
+        print(row)
+    print(changed)
+
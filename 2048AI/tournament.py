@@ -0,0 +1,146 @@
+import argparse
+import json
+import logging
+import time
+from multiprocessing import Pool
+import numpy as np
+from batch_env import BatchEnv
+from compiled_net import BACKENDS
+from game_random import game_seeds
+from selfplay import POLICIES, create_policy
+from training_log import configure_logging
+
+# Tournament runner, plays a large fixed set of seeded games with each policy and reports how they did
+# Game i always gets seed game_seeds(seed, games)[i] and every game draws from its own random streams,
+# so a policy gets exactly the same games no matter the batch size or the number of workers
+# Games are played in batches of batch_size in one BatchEnv each, batches are spread over worker processes
+# and every finished batch is logged and streamed to the output file right away
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (5, 25, 50, 75, 95, 99)
+REACH_TILES = (512, 1024, 2048, 4096)
+
+# The policy of a worker process, created once per process by init_worker
+worker_policy = None
+
+
+def init_worker(name, genome_path, depth, backend):
+    global worker_policy
+    worker_policy = create_policy(name, genome_path, depth, backend)
+
+
+# Play the games with these seeds to the end, returns (first game index, scores, max tiles, moves)
+def play_seeds(job):
+    start, seeds = job
+    env = BatchEnv(len(seeds), seeds=seeds)
+    while env.active.any():
+        moved_boards = env.all_moves()
+        directions = worker_policy(env, moved_boards, env.legal_moves())
+        env.step(directions, moved_boards)
+    return start, env.score.copy(), env.max_tiles(), env.moves.copy()
+
+
+def percentiles(values):
+    return {"p{0}".format(p): float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+# Summary of the games of one policy
+def summarize(scores, max_tiles, moves, elapsed):
+    return {"games": len(scores),
+            "seconds": elapsed,
+            "games_per_sec": len(scores) / elapsed if elapsed > 0 else 0.0,
+            "moves_per_sec": float(moves.sum()) / elapsed if elapsed > 0 else 0.0,
+            "score": dict(mean=float(scores.mean()), min=int(scores.min()), max=int(scores.max()), **percentiles(scores)),
+            "max_tile": dict(min=int(max_tiles.min()), max=int(max_tiles.max()), **percentiles(max_tiles)),
+            "moves": dict(mean=float(moves.mean()), **percentiles(moves)),
+            "reach_rate": {str(tile): float((max_tiles >= tile).mean()) for tile in REACH_TILES}}
+
+
+# Play `games` games with one policy, batch_size at a time over `workers` processes (0 plays in this process)
+# Every game is written to stream as a JSON line when one is given, returns the summary
+def run_policy(name, games, seed=0, batch_size=1024, workers=0, genome_path=None, depth=2, backend="numpy", stream=None):
+    seeds = game_seeds(seed, games)
+    jobs = [(start, seeds[start:start + batch_size]) for start in range(0, games, batch_size)]
+    scores = np.zeros(games, dtype=np.int64)
+    max_tiles = np.zeros(games, dtype=np.int64)
+    moves = np.zeros(games, dtype=np.int64)
+    policy_args = (name, genome_path, depth, backend)
+
+    pool = None
+    if workers > 0:
+        pool = Pool(workers, initializer=init_worker, initargs=policy_args)
+        results = pool.imap_unordered(play_seeds, jobs)
+    else:
+        init_worker(*policy_args)
+        results = map(play_seeds, jobs)
+
+    start_time = time.perf_counter()
+    played = 0
+    try:
+        for start, batch_scores, batch_tiles, batch_moves in results:
+            end = start + len(batch_scores)
+            scores[start:end] = batch_scores
+            max_tiles[start:end] = batch_tiles
+            moves[start:end] = batch_moves
+            played += len(batch_scores)
+            if stream is not None:
+                for i in range(start, end):
+                    stream.write(json.dumps({"policy": name, "game": i, "seed": int(seeds[i]), "score": int(scores[i]),
+                                             "max_tile": int(max_tiles[i]), "moves": int(moves[i])}) + "\n")
+                stream.flush()
+            elapsed = time.perf_counter() - start_time
+            logger.info("%s: %d/%d games, %.1f games/s, best tile %d", name, played, games, played / elapsed,
+                        int(max_tiles.max()))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return summarize(scores, max_tiles, moves, time.perf_counter() - start_time)
+
+
+def log_summary(name, summary):
+    logger.info("%s: %d games in %.1fs, %.1f games/s, %.0f moves/s", name, summary["games"], summary["seconds"],
+                summary["games_per_sec"], summary["moves_per_sec"])
+    logger.info("%s: score mean %.1f, %s", name, summary["score"]["mean"],
+                ", ".join("p{0} {1:.0f}".format(p, summary["score"]["p{0}".format(p)]) for p in PERCENTILES))
+    logger.info("%s: reached %s", name, ", ".join("{0} {1:.1%}".format(tile, summary["reach_rate"][str(tile)])
+                                                  for tile in REACH_TILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the same seeded games with several policies and compare the results")
+    parser.add_argument("--policies", nargs="+", choices=POLICIES, default=["heuristic"], help="Policies to play with")
+    parser.add_argument("--genome", default=None, help="Saved genome for the genome policy, like checkpoints/winner.gz")
+    parser.add_argument("--depth", type=int, default=2, help="Search depth of the search policy")
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy", help="Network backend of the genome policy")
+    parser.add_argument("--games", type=int, default=10000, help="Number of games every policy plays")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the game set, the same seed gives the same games")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Games stepped together")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes, 0 plays in this process")
+    parser.add_argument("--output", default=None, help="Stream a JSON line per game to this file")
+    parser.add_argument("--report", default=None, help="Save the summary of every policy to this JSON file")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows per move detail")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    stream = open(args.output, "w") if args.output is not None else None
+    report = {"games": args.games, "seed": args.seed, "policies": {}}
+    try:
+        for name in args.policies:
+            summary = run_policy(name, args.games, args.seed, args.batch_size, args.workers, args.genome, args.depth,
+                                 args.backend, stream)
+            log_summary(name, summary)
+            report["policies"][name] = summary
+    finally:
+        if stream is not None:
+            stream.close()
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
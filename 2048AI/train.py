@@ -0,0 +1,153 @@
+import neat
+import os
+import argparse
+import logging
+import bitboard
+from training_log import configure_logging, GenerationSummaryReporter
+from encoders import ENCODERS, create_encoder, encoder_for_config, configure_inputs
+from compiled_net import BACKENDS
+from checkpoint import AsyncCheckpointer, latest_checkpoint, restore_checkpoint
+from profiling import NULL_TIMER, PhaseTimer, ProfilingReporter
+from rewards import configure_rewards
+from evaluation import game_loop, SeededEvaluator, SeededParallelEvaluator, FitnessStatsReporter
+
+# Training, run() evolves a population, main() is the command line of python 2048.py and of the 2048ai command
+
+logger = logging.getLogger(__name__)
+
+
+# workers=0 plays the whole generation in one shared batch like before
+# workers>=1 gives every genome its own seeded game, serially for 1 worker or in a process pool for more
+# games, quantile and adaptive control how many games every genome plays and how they are scored, see evaluation.py
+# summary_path appends a JSON line per generation with throughput, max tile and fitness distribution
+# encoder_name picks an input encoder from encoders.ENCODERS and sets num_inputs to match,
+# without it the encoder is picked from num_inputs in the config
+# checkpoint_dir saves checkpoints, the best genome of every generation and the winner, see checkpoint.py
+# resume is a checkpoint file or a checkpoint directory to continue from its newest checkpoint
+# spectate draws the leading game from a separate process at up to fps frames per second without slowing training,
+# headless=False draws every move in this process instead, neither works with more than one worker
+# profile logs per phase times and counters every generation, profile_dir also saves a cProfile dump per generation there
+# board_size and max_exponent train on other boards, the encoder and num_inputs are sized to match
+def run(config_path, headless=True, workers=0, seed=0, games=1, quantile=None, adaptive=False, summary_path=None, encoder_name=None,
+        backend="numpy", generations=100, checkpoint_dir=None, checkpoint_interval=5, resume=None, spectate=False, fps=30,
+        profile=False, profile_dir=None, board_size=4, max_exponent=bitboard.MAX_EXPONENT):
+    if (spectate or not headless) and workers > 1:
+        raise ValueError("Games played in worker processes can not be drawn, use 0 or 1 workers to watch")
+    if (spectate or not headless) and board_size != 4:
+        raise ValueError("Only 4x4 boards can be drawn")
+
+    stats = neat.StatisticsReporter()
+
+    if resume is not None:
+        checkpoint_file = latest_checkpoint(resume) if os.path.isdir(resume) else resume
+        if checkpoint_file is None:
+            raise ValueError("No checkpoint found in " + resume)
+        logger.info("Resuming from %s", checkpoint_file)
+        p = restore_checkpoint(checkpoint_file, stats)
+        config = p.config
+    else:
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                    config_path)
+        configure_rewards(config, config_path)
+    if encoder_name is not None:
+        encoder = create_encoder(encoder_name, board_size, max_exponent)
+        configure_inputs(config, encoder)
+    else:
+        encoder = encoder_for_config(config, board_size, max_exponent)
+
+    if resume is None:
+        p = neat.Population(config)
+
+    p.add_reporter(neat.StdOutReporter(True))
+
+    p.add_reporter(stats)
+    p.add_reporter(FitnessStatsReporter())
+    if summary_path is not None:
+        p.add_reporter(GenerationSummaryReporter(summary_path))
+    timer = NULL_TIMER
+    profiler = None
+    if profile or profile_dir is not None:
+        timer = PhaseTimer()
+        profiler = ProfilingReporter(timer, profile_dir)
+        p.add_reporter(profiler)
+    checkpointer = None
+    if checkpoint_dir is not None:
+        checkpointer = AsyncCheckpointer(checkpoint_dir, checkpoint_interval, stats=stats)
+        p.add_reporter(checkpointer)
+
+    # A resumed run only plays the generations that are left
+    remaining = max(generations - p.generation, 0)
+    evaluator_kwargs = {"seed": seed, "generation": p.generation, "games": games, "quantile": quantile, "adaptive": adaptive,
+                        "encoder": encoder, "backend": backend, "timer": timer, "board_size": board_size,
+                        "max_exponent": max_exponent}
+    # Only import pygame when someone actually wants to watch
+    renderer = None
+    image_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs")
+    if spectate:
+        from spectator import Spectator
+        renderer = Spectator(image_dir, fps)
+    elif not headless:
+        from render import Renderer
+        renderer = Renderer(image_dir)
+
+    if workers > 1:
+        winner = p.run(SeededParallelEvaluator(workers, **evaluator_kwargs).evaluate, remaining)
+    elif workers == 1:
+        winner = p.run(SeededEvaluator(renderer=renderer, **evaluator_kwargs).evaluate, remaining)
+    else:
+        winner = p.run(lambda genomes, config: game_loop(genomes, config, renderer, games, quantile, encoder, backend, timer,
+                                                                 board_size, max_exponent),
+                       remaining)
+    if renderer is not None:
+        renderer.close()
+
+    if checkpointer is not None:
+        checkpointer.close(winner, config)
+        stats.save_genome_fitness(filename=os.path.join(checkpoint_dir, "fitness_history.csv"))
+        stats.save_species_count(filename=os.path.join(checkpoint_dir, "speciation.csv"))
+        stats.save_species_fitness(filename=os.path.join(checkpoint_dir, "species_fitness.csv"))
+        if profiler is not None:
+            profiler.save_metrics(filename=os.path.join(checkpoint_dir, "profile.csv"))
+    return winner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a NEAT network to play 2048")
+    parser.add_argument("--config", default="config-feedforward.txt", help="NEAT config file, in the working directory or next to this script")
+    parser.add_argument("--render", action="store_true", help="Draw the games with pygame while training")
+    parser.add_argument("--spectate", action="store_true", help="Watch the leading game from a separate process, training runs at full speed")
+    parser.add_argument("--fps", type=int, default=30, help="Frame rate cap of --spectate")
+    parser.add_argument("--workers", type=int, default=0, help="Evaluate genomes with their own seeded games in this many processes, 0 shares one batch per generation")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed for the per genome games when --workers is used")
+    parser.add_argument("--games", type=int, default=1, help="Number of games every genome plays per generation")
+    parser.add_argument("--quantile", type=float, default=None, help="Score genomes by this quantile of their games instead of the mean")
+    parser.add_argument("--adaptive", action="store_true", help="Stop playing games for genomes clearly worse than the last elite (needs --workers)")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default=None, help="Network input encoding, overrides num_inputs in the config")
+    parser.add_argument("--backend", choices=BACKENDS, default="numpy", help="Compile networks to numpy matrices or use neat's own FeedForwardNetwork")
+    parser.add_argument("--board-size", type=int, default=4, help="Play on size x size boards, 3 to 8 (pair with --encoder to size the inputs)")
+    parser.add_argument("--max-exponent", type=int, default=bitboard.MAX_EXPONENT, help="Largest tile is 2 ** this, those tiles no longer merge")
+    parser.add_argument("--generations", type=int, default=100, help="Number of generations to train for")
+    parser.add_argument("--checkpoint-dir", default=None, help="Save checkpoints, the best genome of every generation and the winner here")
+    parser.add_argument("--checkpoint-interval", type=int, default=5, help="Generations between checkpoints")
+    parser.add_argument("--resume", default=None, help="Checkpoint file, or checkpoint directory to resume from its newest checkpoint")
+    parser.add_argument("--log-level", default="INFO", help="DEBUG shows per move detail")
+    parser.add_argument("--log-sample", type=float, default=1.0, help="Share of DEBUG records that are actually written")
+    parser.add_argument("--summary", default=None, help="Append a JSON line per generation to this file")
+    parser.add_argument("--profile", action="store_true", help="Log the time spent per phase and move, spawn and game over counts every generation")
+    parser.add_argument("--profile-dir", default=None, help="Also save a cProfile dump of every generation here, implies --profile")
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.log_sample)
+
+    # Config files are looked up in the working directory first and then next to this script
+    config_path = args.config if os.path.exists(args.config) else os.path.join(os.path.dirname(__file__), args.config)
+    run(config_path, headless=not args.render, workers=args.workers, seed=args.seed,
+        games=args.games, quantile=args.quantile, adaptive=args.adaptive, summary_path=args.summary,
+        encoder_name=args.encoder, backend=args.backend, generations=args.generations,
+        checkpoint_dir=args.checkpoint_dir, checkpoint_interval=args.checkpoint_interval, resume=args.resume,
+        spectate=args.spectate, fps=args.fps, profile=args.profile, profile_dir=args.profile_dir,
+        board_size=args.board_size, max_exponent=args.max_exponent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import json
+import logging
+import random
+import time
+import numpy as np
+import neat
+
+# Logging for training runs
+# Modules log through logging.getLogger(__name__), per move detail goes to DEBUG and is off by default
+# Per generation summaries can also be written as JSON lines by GenerationSummaryReporter
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+# Lets through every INFO and higher record but only a random sample_rate share of the DEBUG ones
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rate=1.0, seed=None):
+        logging.Filter.__init__(self)
+        self.sample_rate = sample_rate
+        self.random = random.Random(seed)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.sample_rate >= 1.0:
+            return True
+        return self.random.random() < self.sample_rate
+
+
+# Set up the root logger once for a training process, level is a name like "INFO" or "DEBUG"
+def configure_logging(level="INFO", sample_rate=1.0):
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(SamplingFilter(sample_rate))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+# Writes one JSON record per generation: games played, moves per second, max tile and the fitness distribution
+# Reads the statistics the evaluators store on every genome (see evaluation.record_scores)
+class GenerationSummaryReporter(neat.reporting.BaseReporter):
+    def __init__(self, path):
+        self.path = path
+        self.generation = None
+        self.start_time = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.start_time = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        elapsed = time.perf_counter() - self.start_time
+        genomes = list(population.values())
+        fitnesses = np.array([genome.fitness for genome in genomes], dtype=np.float64)
+        moves = int(sum(getattr(genome, "moves_played", 0) for genome in genomes))
+        record = {"generation": self.generation,
+                  "seconds": elapsed,
+                  "genomes": len(genomes),
+                  "games_played": int(sum(getattr(genome, "games_played", 1) for genome in genomes)),
+                  "moves": moves,
+                  "moves_per_second": moves / elapsed if elapsed > 0 else 0.0,
+                  "max_tile": int(max(getattr(genome, "max_tile", 0) for genome in genomes)),
+                  "fitness": {"min": float(fitnesses.min()),
+                              "mean": float(fitnesses.mean()),
+                              "median": float(np.median(fitnesses)),
+                              "max": float(fitnesses.max()),
+                              "stdev": float(fitnesses.std())}}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")